@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Admission control in front of the LLM
+Caps concurrent generations, queues the rest in a bounded queue ordered by
+priority class and round-robin across users, and sheds load quickly (queue
+full, per-user limit, queue timeout) so callers can serve a fallback instead
+of waiting on an overloaded model
+"""
+import asyncio
+import time
+import numpy as np
+from collections import OrderedDict, defaultdict, deque
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import AsyncIterator, Callable, Deque, Dict, Any, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Lower values are served first"""
+    INTERACTIVE = 0  # chat the user is waiting on
+    PREVIEW = 1      # coach previews
+    BACKGROUND = 2   # insight generation nobody is waiting on
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of queued or served"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("user_id", "priority", "future", "enqueued_at", "queued")
+
+    def __init__(self, user_id: str, priority: Priority, future: asyncio.Future):
+        self.user_id = user_id
+        self.priority = priority
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.queued = True
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = 2, max_queue: int = 32, max_wait: float = 10.0,
+                 max_queued_per_user: int = 2):
+        """
+        Initialize the controller
+
+        Not thread-safe: acquire and release from the event loop.
+
+        Args:
+            max_concurrent: Generations allowed to run at once
+            max_queue: Requests allowed to wait; beyond this lower priority
+                       waiters are dropped for higher priority arrivals, otherwise
+                       the arrival is rejected
+            max_wait: Default seconds a request may wait for a slot
+            max_queued_per_user: Requests one user may have waiting at once
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_queued_per_user = max_queued_per_user
+
+        # priority -> user -> waiters, users in round-robin order
+        self._queues: Dict[Priority, "OrderedDict[str, Deque[_Waiter]]"] = {p: OrderedDict() for p in Priority}
+        self._queued_by_user: Dict[str, int] = defaultdict(int)
+        self.in_flight = 0
+        self.queued = 0
+
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "user_limit": 0, "timeout": 0, "preempted": 0}
+        self._wait_times: Deque[float] = deque(maxlen=1000)
+
+    @asynccontextmanager
+    async def slot(self, user_id: str, priority: Priority = Priority.INTERACTIVE,
+                   max_wait: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Hold a generation slot for the body of an `async with` block
+
+        Raises:
+            AdmissionRejected when the request is shed
+        """
+        await self.acquire(user_id, priority, max_wait)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def run_in_thread(self, user_id: str, func: Callable[..., T], *args,
+                            priority: Priority = Priority.INTERACTIVE, max_wait: Optional[float] = None) -> T:
+        """
+        Run a blocking call in a worker thread while holding a slot
+
+        The slot is released when the call returns, not when the caller is
+        cancelled: the thread can't be stopped, so it still uses capacity.
+
+        Raises:
+            AdmissionRejected when the request is shed
+        """
+        await self.acquire(user_id, priority, max_wait)
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(func, *args))
+        task.add_done_callback(lambda _: self.release())
+        return await asyncio.shield(task)
+
+    async def acquire(self, user_id: str, priority: Priority = Priority.INTERACTIVE,
+                      max_wait: Optional[float] = None):
+        """
+        Wait for a generation slot; pair with release()
+
+        Raises:
+            AdmissionRejected when the request is shed
+        """
+        if self.in_flight < self.max_concurrent and self.queued == 0:
+            self.in_flight += 1
+            self._admitted(0.0)
+            return
+
+        if self._queued_by_user.get(user_id, 0) >= self.max_queued_per_user:
+            self._reject("user_limit", f"User {user_id} already has {self.max_queued_per_user} queued requests")
+
+        if self.queued >= self.max_queue:
+            victim = self._newest_waiter_below(priority)
+            if victim is None:
+                self._reject("queue_full", f"LLM queue full ({self.max_queue} waiting)")
+            self._remove(victim)
+            self.rejected["preempted"] += 1
+            victim.future.set_exception(AdmissionRejected("preempted", "Dropped for a higher priority request"))
+
+        waiter = _Waiter(user_id, priority, asyncio.get_running_loop().create_future())
+        users = self._queues[priority]
+        users.setdefault(user_id, deque()).append(waiter)
+        self._queued_by_user[user_id] += 1
+        self.queued += 1
+
+        try:
+            await asyncio.wait_for(waiter.future, self.max_wait if max_wait is None else max_wait)
+        except asyncio.TimeoutError:
+            if self._granted(waiter):
+                # Granted just as the timeout fired (possible on 3.12+, where
+                # wait_for is built on asyncio.timeout); the slot is ours
+                return
+            self._discard(waiter)
+            self._reject("timeout", "Timed out waiting for an LLM slot")
+        except asyncio.CancelledError:
+            if self._granted(waiter):
+                # Granted a slot just as the caller went away; hand it on
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+
+    def release(self):
+        """Return a slot and start the next waiter"""
+        self.in_flight -= 1
+        self._dispatch()
+
+    def stats(self) -> Dict[str, Any]:
+        waits = np.array(self._wait_times, dtype=np.float64) * 1000
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queued,
+            "queue_depth_by_priority": {
+                p.name.lower(): sum(len(waiters) for waiters in self._queues[p].values()) for p in Priority
+            },
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "wait_ms": {
+                "avg": round(float(waits.mean()), 1) if waits.size else 0.0,
+                "p95": round(float(np.percentile(waits, 95)), 1) if waits.size else 0.0,
+                "max": round(float(waits.max()), 1) if waits.size else 0.0
+            }
+        }
+
+    def _dispatch(self):
+        while self.in_flight < self.max_concurrent:
+            waiter = self._next_waiter()
+            if waiter is None:
+                return
+            if waiter.future.done():
+                continue  # timed out or cancelled concurrently
+            self.in_flight += 1
+            self._admitted(time.monotonic() - waiter.enqueued_at)
+            waiter.future.set_result(None)
+
+    def _next_waiter(self) -> Optional[_Waiter]:
+        """Highest priority first; within a priority, one request per user in turn"""
+        for priority in Priority:
+            users = self._queues[priority]
+            if users:
+                user_id = next(iter(users))
+                waiter = users[user_id][0]
+                self._remove(waiter)
+                if user_id in users:
+                    users.move_to_end(user_id)
+                return waiter
+        return None
+
+    def _newest_waiter_below(self, priority: Priority) -> Optional[_Waiter]:
+        for lower in reversed(Priority):
+            if lower <= priority:
+                return None
+            users = self._queues[lower]
+            if users:
+                return users[next(reversed(users))][-1]
+        return None
+
+    def _remove(self, waiter: _Waiter):
+        users = self._queues[waiter.priority]
+        waiters = users[waiter.user_id]
+        waiters.remove(waiter)
+        if not waiters:
+            del users[waiter.user_id]
+        waiter.queued = False
+        self.queued -= 1
+        self._queued_by_user[waiter.user_id] -= 1
+        if not self._queued_by_user[waiter.user_id]:
+            del self._queued_by_user[waiter.user_id]
+
+    @staticmethod
+    def _granted(waiter: _Waiter) -> bool:
+        future = waiter.future
+        return future.done() and not future.cancelled() and future.exception() is None
+
+    def _discard(self, waiter: _Waiter):
+        if waiter.queued:
+            self._remove(waiter)
+
+    def _admitted(self, wait: float):
+        self.admitted += 1
+        self._wait_times.append(wait)
+
+    def _reject(self, reason: str, message: str):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(reason, message)
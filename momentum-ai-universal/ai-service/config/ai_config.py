@@ -39,17 +39,53 @@ DEFAULT_EMBEDDING_CONFIG = {
     "normalize": True
 }
 
+# Environment variables
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+# Shared Ollama HTTP transport: timeouts (seconds), retries for connection
+# failures, keep-alive pool size and circuit breaker (failures to open, seconds open)
+OLLAMA_CONNECT_TIMEOUT = float(os.getenv("OLLAMA_CONNECT_TIMEOUT", "5"))
+OLLAMA_READ_TIMEOUT = float(os.getenv("OLLAMA_READ_TIMEOUT", "60"))
+OLLAMA_MAX_RETRIES = int(os.getenv("OLLAMA_MAX_RETRIES", "2"))
+OLLAMA_POOL_SIZE = int(os.getenv("OLLAMA_POOL_SIZE", "16"))
+OLLAMA_BREAKER_THRESHOLD = int(os.getenv("OLLAMA_BREAKER_THRESHOLD", "5"))
+OLLAMA_BREAKER_RESET = float(os.getenv("OLLAMA_BREAKER_RESET", "30"))
+VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "data/vector_store")
+# Memory-map saved FAISS indexes read-only so worker processes share pages
+VECTOR_STORE_MMAP = os.getenv("VECTOR_STORE_MMAP", "false").lower() in ("1", "true", "yes")
+# Semantic cache for coaching replies: size, TTL (seconds) and cosine similarity for a hit
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "600"))
+RESPONSE_CACHE_THRESHOLD = float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95"))
+# Estimated tokens of retrieved context per RAG prompt; keep well below the
+# model's context_window so prefill time stays predictable
+RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "768"))
+# Admission control for generations: concurrent slots, queued requests,
+# seconds a request may wait, and queued requests per user
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "2"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "32"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "10"))
+LLM_QUEUE_PER_USER = int(os.getenv("LLM_QUEUE_PER_USER", "2"))
+
 DEFAULT_VECTOR_STORE_CONFIG = {
     "provider": VectorStore.FAISS.value,
+    # IndexFlatL2, IndexFlatIP, IndexIVFFlat, IndexIVFPQ, IndexHNSWFlat,
+    # IndexSQ8 or IndexSQfp16
     "index_type": "IndexFlatL2",
     "dimension": 768,
-    "metric": "l2"
+    "metric": "l2",  # l2, ip or cosine
+    "mmap": VECTOR_STORE_MMAP,
+    # IVF: number of coarse cells and cells probed per query
+    "nlist": 100,
+    "nprobe": 8,
+    # PQ: sub-quantizers per vector and bits per code
+    "pq_m": 16,
+    "pq_nbits": 8,
+    # HNSW: graph degree and build/search breadth
+    "hnsw_m": 32,
+    "ef_construction": 40,
+    "ef_search": 64
 }
 
-# Environment variables
-OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
-VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "data/vector_store")
-
 class AIConfig:
     def __init__(
         self,
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Token-budgeted context assembly for RAG prompts
+Ranks retrieved items across data types, drops near-duplicates with MMR,
+truncates long entries and stops at a token budget
+"""
+import math
+import re
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+EMPTY_CONTEXT = "No relevant context found."
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate (~4 characters per token for English BPE vocabularies)
+
+    Deliberately model-agnostic: it only has to keep prompts under budget,
+    not match the tokenizer exactly.
+    """
+    return math.ceil(len(text) / 4)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to roughly max_tokens, at a word boundary"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4].rsplit(" ", 1)[0]
+    return cut.rstrip(" ,.;:") + "…"
+
+
+class ContextBuilder:
+    def __init__(self, token_budget: int = 768, max_item_tokens: int = 96, mmr_lambda: float = 0.7,
+                 duplicate_threshold: float = 0.92):
+        """
+        Initialize the builder
+
+        Args:
+            token_budget: Upper bound on estimated tokens of the formatted context
+            max_item_tokens: Longer entries are truncated to this many tokens
+            mmr_lambda: Relevance vs. diversity trade-off (1.0 = relevance only)
+            duplicate_threshold: Items at least this similar to a selected one are dropped
+        """
+        self.token_budget = token_budget
+        self.max_item_tokens = max_item_tokens
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+
+    def build(self, context_data: Dict[str, Any], k: int = 3,
+              vectors: Optional[Dict[int, np.ndarray]] = None) -> str:
+        """
+        Format retrieved context within the token budget
+
+        Args:
+            context_data: get_user_context result ({"relevant_data": {type: [items]}})
+            k: Maximum items considered per data type
+            vectors: Normalized embeddings by doc id, used for MMR; word overlap
+                     is used for items without one
+
+        Returns:
+            Formatted context string
+        """
+        candidates = []
+        for data_type, items in context_data.get("relevant_data", {}).items():
+            for item in items[:k]:
+                text = item.get('text', item.get('content', ''))
+                if text:
+                    candidates.append({**item, "data_type": data_type, "text": text})
+
+        if not candidates:
+            return EMPTY_CONTEXT
+
+        selected = self._select(candidates, vectors or {})
+        return "\n".join(self._format(item, i) for i, item in enumerate(selected)) if selected else EMPTY_CONTEXT
+
+    def _select(self, candidates: List[Dict[str, Any]], vectors: Dict[int, np.ndarray]) -> List[Dict[str, Any]]:
+        """Greedy MMR selection across all data types until the budget is spent"""
+        relevance = np.array([item.get('score', 0.0) for item in candidates], dtype=np.float32)
+        similarity = self._similarity_matrix(candidates, vectors)
+
+        selected: List[int] = []
+        remaining = list(np.argsort(-relevance, kind="stable"))
+        used_tokens = 0
+
+        while remaining:
+            if selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+            else:
+                redundancy = np.zeros(len(remaining), dtype=np.float32)
+
+            mmr = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+            best = int(np.argmax(mmr))
+            index = remaining.pop(best)
+
+            if redundancy[best] >= self.duplicate_threshold:
+                continue  # near-duplicate of something already in the prompt
+
+            line = self._format(candidates[index], len(selected))
+            cost = estimate_tokens(line) + 1
+            if used_tokens + cost > self.token_budget:
+                continue  # try smaller items that may still fit
+            used_tokens += cost
+            selected.append(index)
+
+        return [candidates[i] for i in selected]
+
+    def _similarity_matrix(self, candidates: List[Dict[str, Any]], vectors: Dict[int, np.ndarray]) -> np.ndarray:
+        n = len(candidates)
+        ids = [item.get('id') for item in candidates]
+        if all(doc_id in vectors for doc_id in ids):
+            matrix = np.vstack([vectors[doc_id] for doc_id in ids]).astype(np.float32)
+            return matrix @ matrix.T
+
+        # Fallback: Jaccard overlap of word sets
+        words = [set(re.findall(r"\w+", item["text"].lower())) for item in candidates]
+        similarity = np.zeros((n, n), dtype=np.float32)
+        for i in range(n):
+            for j in range(i, n):
+                union = len(words[i] | words[j])
+                similarity[i, j] = similarity[j, i] = len(words[i] & words[j]) / union if union else 0.0
+        return similarity
+
+    def _format(self, item: Dict[str, Any], position: int) -> str:
+        text = truncate_to_tokens(item["text"], self.max_item_tokens)
+        timestamp = item.get('timestamp') or ''
+        return (f"  {position + 1}. [{item['data_type'].upper()} {item.get('score', 0):.3f}] "
+                f"{text} (from {timestamp[:10]})")
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Asyncio micro-batching for embedding requests
+Coalesces concurrent single-text awaits into one batched encode call
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Any, List, Optional, Set, Tuple
+
+import numpy as np
+
+
+class AsyncMicroBatcher:
+    def __init__(self, encode_fn: Callable[[List[str]], Awaitable[np.ndarray]],
+                 max_batch_size: int = 64, max_wait_ms: float = 5.0):
+        """
+        Initialize the batcher
+
+        Args:
+            encode_fn: Coroutine function embedding a list of texts in one call
+            max_batch_size: Texts per encode call; a full batch is flushed immediately
+            max_wait_ms: How long the first text of a batch waits for others to join
+        """
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # The loop only keeps weak references to tasks; hold in-flight encodes here
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.items = 0
+
+    async def submit(self, text: str) -> np.ndarray:
+        """Embed one text as part of the next batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "queued": len(self._pending),
+            "in_flight_batches": len(self._tasks)
+        }
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Always called from the loop (submit or its timer), so this is the loop the futures belong to
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = loop.create_task(self._encode(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _encode(self, batch: List[Tuple[str, asyncio.Future]]):
+        # Identical texts in a batch (e.g. check-in templates) are encoded once
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.items += len(batch)
+
+        try:
+            embeddings = await self.encode_fn(unique_texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(unique_texts, embeddings))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(by_text[text])
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Two-tier embedding cache
+A bounded in-memory LRU with TTL in front of an optional SQLite file that
+stores float16 vectors and is shared by every worker process
+"""
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+
+class DiskEmbeddingCache:
+    def __init__(self, db_path: str, max_entries: int = 100000, max_age: float = 30 * 86400.0):
+        """
+        Open (or create) the shared on-disk tier
+
+        Rows are evicted oldest-stored first: entries older than max_age
+        read as misses and are deleted, and the table is trimmed back to
+        max_entries at startup and after every max_entries // 10 inserts,
+        so it can briefly exceed the bound by about 10%.
+
+        Args:
+            db_path: Path to the SQLite file; safe to share between processes
+            max_entries: Rows kept on disk (0 disables the limit)
+            max_age: Seconds a row stays valid (0 disables expiry)
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self._prune_every = max(1, max_entries // 10)
+        self._puts_since_prune = 0
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                stored_at REAL NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(embeddings)")}
+        if "stored_at" not in columns:
+            # Files from before eviction existed; start their clock now
+            self._conn.execute("ALTER TABLE embeddings ADD COLUMN stored_at REAL NOT NULL DEFAULT 0")
+            self._conn.execute("UPDATE embeddings SET stored_at = ?", (time.time(),))
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_stored_at ON embeddings (stored_at)")
+        self._conn.commit()
+        self.prune()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT dim, vector FROM embeddings WHERE key = ? AND stored_at >= ?", (key, self._cutoff())
+            ).fetchone()
+        if row is None:
+            return None
+        dim, blob = row
+        return np.frombuffer(blob, dtype=np.float16, count=dim).astype(np.float32)
+
+    def put(self, key: str, embedding: np.ndarray):
+        vector = np.asarray(embedding, dtype=np.float16)
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, dim, vector, stored_at) VALUES (?, ?, ?, ?)",
+                    (key, int(vector.shape[0]), vector.tobytes(), time.time())
+                )
+            self._puts_since_prune += 1
+            due = self._puts_since_prune >= self._prune_every
+        if due:
+            self.prune()
+
+    def prune(self) -> int:
+        """
+        Delete expired rows and trim the table to max_entries
+
+        Returns:
+            Number of rows deleted
+        """
+        with self._lock:
+            self._puts_since_prune = 0
+            with self._conn:
+                deleted = self._conn.execute(
+                    "DELETE FROM embeddings WHERE stored_at < ?", (self._cutoff(),)
+                ).rowcount
+                if self.max_entries:
+                    excess = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+                    if excess > 0:
+                        deleted += self._conn.execute(
+                            "DELETE FROM embeddings WHERE key IN "
+                            "(SELECT key FROM embeddings ORDER BY stored_at LIMIT ?)",
+                            (excess,)
+                        ).rowcount
+        return deleted
+
+    def _cutoff(self) -> float:
+        # Wall clock, since rows are shared between processes
+        return time.time() - self.max_age if self.max_age else float("-inf")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EmbeddingCache:
+    def __init__(self, max_size: int = 10000, ttl: float = 86400.0, disk_path: Optional[str] = None,
+                 disk_max_entries: int = 100000, disk_ttl: float = 30 * 86400.0):
+        """
+        Initialize the cache
+
+        Args:
+            max_size: Entries kept in memory before the least recently used is evicted
+            ttl: Seconds an in-memory entry stays valid (0 disables expiry)
+            disk_path: SQLite file for the persistent tier (None keeps the cache in memory only)
+            disk_max_entries: Rows kept in the disk tier (0 disables the limit)
+            disk_ttl: Seconds a disk row stays valid (0 disables expiry)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk = DiskEmbeddingCache(disk_path, disk_max_entries, disk_ttl) if disk_path else None
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Look a key up in memory, then on disk (promoting disk hits to memory)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                embedding, stored_at = entry
+                if not self.ttl or now - stored_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return embedding
+                del self._entries[key]
+
+        embedding = self.disk.get(key) if self.disk is not None else None
+        with self._lock:
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, embedding, now)
+        return embedding
+
+    def put(self, key: str, embedding: np.ndarray):
+        """Store an embedding in both tiers"""
+        with self._lock:
+            self._remember(key, embedding, time.monotonic())
+        if self.disk is not None:
+            self.disk.put(key, embedding)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        """Drop the in-memory tier (the disk tier is left untouched)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "disk_entries": len(self.disk) if self.disk is not None else 0
+        }
+
+    def _remember(self, key: str, embedding: np.ndarray, stored_at: float):
+        # Caller holds self._lock
+        self._entries[key] = (embedding, stored_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
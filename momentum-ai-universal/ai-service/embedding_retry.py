@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Shared failure handling for embedding backends
+"""
+import random
+
+
+class EmbeddingError(Exception):
+    """Raised when an embedding backend cannot produce a vector"""
+
+
+class Backoff:
+    def __init__(self, base_delay: float = 2.0, max_delay: float = 300.0, jitter: float = 0.25):
+        """
+        Exponential backoff policy for re-embedding pending documents
+
+        Args:
+            base_delay: Delay in seconds before the first retry
+            max_delay: Upper bound on the delay between retries
+            jitter: Random +/- fraction applied to each delay
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delay(self, attempts: int) -> float:
+        """Seconds to wait after the given number of failed attempts"""
+        delay = min(self.max_delay, self.base_delay * (2 ** max(attempts - 1, 0)))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
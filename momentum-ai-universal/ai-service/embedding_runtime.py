@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Embedding model runtimes
+Loads the SentenceTransformer on PyTorch, ONNX Runtime, or ONNX Runtime
+with a dynamically int8-quantized graph for CPU-only inference
+"""
+import logging
+import os
+
+RUNTIMES = ("torch", "onnx", "onnx-int8")
+
+# Pre-quantized graph shipped in the sentence-transformers hub repos;
+# avx2 runs on any x86-64 node, override with the avx512/arm64 variants
+DEFAULT_ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+def load_embedding_model(model_name: str, runtime: str = "torch"):
+    """
+    Load a SentenceTransformer on the requested runtime
+
+    Args:
+        model_name: Hugging Face model id or local path
+        runtime: "torch", "onnx" or "onnx-int8"
+
+    Returns:
+        SentenceTransformer instance
+    """
+    from sentence_transformers import SentenceTransformer
+
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unknown embeddings runtime '{runtime}', expected one of {RUNTIMES}")
+
+    if runtime == "torch":
+        return SentenceTransformer(model_name)
+
+    if runtime == "onnx":
+        return SentenceTransformer(model_name, backend="onnx")
+
+    file_name = os.getenv("EMBEDDINGS_ONNX_FILE", DEFAULT_ONNX_INT8_FILE)
+    try:
+        return SentenceTransformer(model_name, backend="onnx", model_kwargs={"file_name": file_name})
+    except Exception as e:
+        # No pre-quantized graph for this model: export and quantize it locally
+        logging.warning(f"Could not load {file_name} for {model_name} ({str(e)}), quantizing locally")
+        return _quantize_locally(model_name)
+
+
+def _quantize_locally(model_name: str):
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.backend import export_dynamic_quantized_onnx_model
+
+    save_dir = os.path.join(
+        os.getenv("EMBEDDINGS_ONNX_DIR", "data/onnx_models"),
+        model_name.replace("/", "__")
+    )
+    quantized_file = "onnx/model_qint8_avx2.onnx"
+
+    if not os.path.exists(os.path.join(save_dir, quantized_file)):
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save_pretrained(save_dir)
+        export_dynamic_quantized_onnx_model(model, "avx2", save_dir)
+
+    return SentenceTransformer(save_dir, backend="onnx", model_kwargs={"file_name": quantized_file})
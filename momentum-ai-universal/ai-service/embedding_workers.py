@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Process-pool embedding backend
+Each worker process loads the SentenceTransformer once; embeddings come
+back through a shared-memory block instead of being pickled
+"""
+import asyncio
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+# Model owned by the current worker process
+_worker_model = None
+
+
+def _init_worker(model_name: str, runtime: str, torch_threads: int):
+    """Pool initializer: load the model once per worker process"""
+    global _worker_model
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+    from embedding_runtime import load_embedding_model
+    _worker_model = load_embedding_model(model_name, runtime)
+
+
+def _worker_dimension() -> int:
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+def _encode_into(texts: List[str], shm_name: str, offset: int, dim: int) -> int:
+    """Encode texts and write them into rows offset.. of the shared output block"""
+    # Workers share the parent's resource tracker, so attaching here does not
+    # change ownership; the parent unlinks the block after copying it out
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray((offset + len(texts), dim), dtype=np.float32, buffer=shm.buf)
+        out[offset:] = _worker_model.encode(texts, convert_to_numpy=True)
+        del out
+    finally:
+        shm.close()
+    return len(texts)
+
+
+class ProcessEncoder:
+    def __init__(self, model_name: str, runtime: str = "torch", workers: Optional[int] = None,
+                 torch_threads: int = 1):
+        """
+        Start the worker pool and load the model in every worker
+
+        Args:
+            model_name: SentenceTransformer model to load in each worker
+            runtime: "torch", "onnx" or "onnx-int8" (see embedding_runtime)
+            workers: Number of worker processes (defaults to the CPU count)
+            torch_threads: Intra-op threads per worker; keep workers * threads <= cores
+        """
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        # spawn, not fork: torch and tokenizers are not fork-safe once initialised
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, runtime, torch_threads)
+        )
+        self.dimension = self.pool.submit(_worker_dimension).result()
+
+    async def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts across the pool
+
+        The batch is split into one slice per worker; all slices write into
+        a single shared-memory block that is copied out once.
+        """
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+
+        loop = asyncio.get_running_loop()
+        shm = shared_memory.SharedMemory(create=True, size=len(texts) * self.dimension * 4)
+        try:
+            chunk = math.ceil(len(texts) / self.workers)
+            await asyncio.gather(*[
+                loop.run_in_executor(
+                    self.pool, _encode_into, texts[start:start + chunk], shm.name, start, self.dimension
+                )
+                for start in range(0, len(texts), chunk)
+            ])
+            view = np.ndarray((len(texts), self.dimension), dtype=np.float32, buffer=shm.buf)
+            embeddings = view.copy()
+            del view
+            return embeddings
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -1,5 +1,4 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from typing import List, Dict, Any, Optional, Tuple
 import logging
 import json
@@ -7,9 +6,17 @@ from datetime import datetime
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import hashlib
+import time
+from collections import OrderedDict
 from supabase import Client
 import os
 
+from embedding_retry import EmbeddingError, Backoff
+from embedding_cache import EmbeddingCache
+from embedding_batcher import AsyncMicroBatcher
+from embedding_runtime import load_embedding_model
+from user_embedding_mirror import UserEmbeddingMirror
+
 class EmbeddingsService:
     """
     Advanced embeddings service using reliable sentence transformers models
@@ -20,7 +27,45 @@ class EmbeddingsService:
         self.model = None
         self.embedding_dim = 384  # Default dimension for all-MiniLM-L6-v2
         self.executor = ThreadPoolExecutor(max_workers=4)
-        self.cache = {}  # Simple in-memory cache
+        self.model_name = os.getenv('EMBEDDINGS_MODEL', 'all-MiniLM-L6-v2')
+        # "torch", "onnx" or "onnx-int8" (dynamically quantized, CPU only)
+        self.runtime = os.getenv('EMBEDDINGS_RUNTIME', 'torch').lower()
+        # "thread" encodes in this process; "process" uses a worker pool outside the GIL
+        self.backend = os.getenv('EMBEDDINGS_BACKEND', 'thread').lower()
+        self.process_encoder = None
+        
+        # Bounded LRU/TTL cache, optionally backed by a SQLite file shared across workers
+        self.cache = EmbeddingCache(
+            max_size=int(os.getenv('EMBEDDINGS_CACHE_SIZE', '10000')),
+            ttl=float(os.getenv('EMBEDDINGS_CACHE_TTL', '86400')),
+            disk_path=os.getenv('EMBEDDINGS_CACHE_PATH') or None,
+            disk_max_entries=int(os.getenv('EMBEDDINGS_CACHE_DISK_SIZE', '100000')),
+            disk_ttl=float(os.getenv('EMBEDDINGS_CACHE_DISK_TTL', str(30 * 86400)))
+        )
+        
+        # Write-through local mirror of per-user embeddings for similarity search
+        self.mirror = UserEmbeddingMirror(
+            max_users=int(os.getenv('EMBEDDINGS_USER_CACHE_SIZE', '1000')),
+            ttl=float(os.getenv('EMBEDDINGS_USER_CACHE_TTL', '0'))
+        )
+        
+        # analyze_behavior_patterns results per (user, timeframe); an entry is
+        # stale once the user's behavior version moves on or the day changes
+        self._behavior_versions = {}
+        self._pattern_cache = OrderedDict()
+        
+        # Concurrent encode_text calls are coalesced into one model.encode call
+        self.batcher = AsyncMicroBatcher(
+            self._run_encode,
+            max_batch_size=int(os.getenv('EMBEDDINGS_MAX_BATCH', '64')),
+            max_wait_ms=float(os.getenv('EMBEDDINGS_MAX_WAIT_MS', '5'))
+        )
+        
+        # Items whose embedding failed, re-encoded and stored by a background task.
+        # Held in memory only: anything still pending when the process exits is lost.
+        self.retry_backoff = Backoff()
+        self.pending = []
+        self._retry_task = None
         
         # Initialize model
         self._load_model()
@@ -29,11 +74,24 @@ class EmbeddingsService:
         """Load a reliable sentence transformer model"""
         try:
             # Use a smaller, more reliable model that's commonly available
-            model_name = os.getenv('EMBEDDINGS_MODEL', 'all-MiniLM-L6-v2')
-            logging.info(f"Loading embeddings model: {model_name}")
-            
-            self.model = SentenceTransformer(model_name)
-            self.embedding_dim = self.model.get_sentence_embedding_dimension()
+            model_name = self.model_name
+            logging.info(f"Loading embeddings model: {model_name} ({self.runtime} runtime)")
+            
+            if self.backend == 'process':
+                # Workers own the model; the API process never loads it
+                from embedding_workers import ProcessEncoder
+                workers = os.getenv('EMBEDDINGS_WORKERS')
+                self.process_encoder = ProcessEncoder(
+                    model_name,
+                    runtime=self.runtime,
+                    workers=int(workers) if workers else None,
+                    torch_threads=int(os.getenv('EMBEDDINGS_WORKER_THREADS', '1'))
+                )
+                self.embedding_dim = self.process_encoder.dimension
+                logging.info(f"Started {self.process_encoder.workers} embedding worker processes")
+            else:
+                self.model = load_embedding_model(model_name, self.runtime)
+                self.embedding_dim = self.model.get_sentence_embedding_dimension()
             
             logging.info(f"Embeddings model loaded successfully. Dimension: {self.embedding_dim}")
         except Exception as e:
@@ -46,56 +104,82 @@ class EmbeddingsService:
     async def encode_text(self, text: str) -> np.ndarray:
         """
         Encode text to embeddings
+        
+        Raises EmbeddingError if the model is unavailable or encoding fails;
+        failures are never cached.
         """
-        try:
-            # Check cache first
-            text_hash = hashlib.md5(text.encode()).hexdigest()
-            if text_hash in self.cache:
-                return self.cache[text_hash]
-            
-            if self.model is None:
-                # Return dummy embedding if model failed to load
-                embedding_array = np.random.random(self.embedding_dim).astype(np.float32)
-                self.cache[text_hash] = embedding_array
-                return embedding_array
-            
-            # Encode text in thread pool to avoid blocking
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                self.executor, 
-                self.model.encode, 
-                [text]
-            )
-            
-            # Cache the result
-            embedding_array = embedding[0]
-            self.cache[text_hash] = embedding_array
-            
-            return embedding_array
-            
-        except Exception as e:
-            logging.error(f"Error encoding text: {str(e)}")
-            return np.random.random(self.embedding_dim).astype(np.float32)
+        # Check cache first
+        text_hash = self._cache_key(text)
+        cached = self.cache.get(text_hash)
+        if cached is not None:
+            return cached
+        
+        # Wait for a micro-batch shared with other concurrent callers
+        embedding_array = await self.batcher.submit(text)
+        
+        # Cache the result
+        self.cache.put(text_hash, embedding_array)
+        
+        return embedding_array
     
     async def encode_batch(self, texts: List[str]) -> np.ndarray:
         """
         Encode multiple texts in batch for efficiency
+        Only texts missing from the cache are sent to the model.
+        
+        Raises EmbeddingError if the model is unavailable or encoding fails.
         """
+        keys = [self._cache_key(text) for text in texts]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, embedding in enumerate(results) if embedding is None]
+        
+        if missing:
+            embeddings = await self._run_encode([texts[i] for i in missing])
+            for i, embedding in zip(missing, embeddings):
+                self.cache.put(keys[i], embedding)
+                results[i] = embedding
+        
+        return np.stack(results) if results else np.zeros((0, self.embedding_dim), dtype=np.float32)
+    
+    async def _run_encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Run one model.encode call off the event loop
+        (thread pool, or the worker processes when EMBEDDINGS_BACKEND=process)
+        
+        Raises EmbeddingError if the model is unavailable or encoding fails.
+        """
+        if self.process_encoder is not None:
+            try:
+                return await self.process_encoder.encode(texts)
+            except Exception as e:
+                logging.error(f"Error encoding texts in worker pool: {str(e)}")
+                raise EmbeddingError(f"Error encoding texts in worker pool: {e}") from e
+        
+        if self.model is None:
+            raise EmbeddingError("Embeddings model is not loaded")
+        
         try:
-            if self.model is None:
-                return np.random.random((len(texts), self.embedding_dim)).astype(np.float32)
-                
             loop = asyncio.get_event_loop()
-            embeddings = await loop.run_in_executor(
+            return await loop.run_in_executor(
                 self.executor, 
                 self.model.encode, 
                 texts
             )
-            return embeddings
-            
         except Exception as e:
-            logging.error(f"Error encoding batch: {str(e)}")
-            return np.random.random((len(texts), self.embedding_dim)).astype(np.float32)
+            logging.error(f"Error encoding texts: {str(e)}")
+            raise EmbeddingError(f"Error encoding texts: {e}") from e
+    
+    def batching_stats(self) -> Dict[str, Any]:
+        """Micro-batch counts and average batch size for encode_text"""
+        return self.batcher.stats()
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Embedding cache size and hit/miss counters"""
+        return self.cache.stats()
+    
+    def _cache_key(self, text: str) -> str:
+        # Include model and runtime so switching either never serves stale vectors
+        return hashlib.md5(f"{self.model_name}\0{self.runtime}\0{text}".encode()).hexdigest()
     
     async def encode_user_behavior(self, user_id: str, behavior_data: Dict[str, Any]) -> np.ndarray:
         """
@@ -106,7 +190,11 @@ class EmbeddingsService:
             behavior_text = self._behavior_to_text(behavior_data)
             
             # Generate embedding
-            embedding = await self.encode_text(behavior_text)
+            try:
+                embedding = await self.encode_text(behavior_text)
+            except EmbeddingError as e:
+                self._defer_embedding('behavior', user_id, behavior_text, behavior_data, str(e))
+                return np.zeros(self.embedding_dim)
             
             # Store in database for future retrieval
             await self._store_behavior_embedding(user_id, behavior_data, embedding)
@@ -126,7 +214,11 @@ class EmbeddingsService:
             conversation_text = self._conversation_to_text(message, context)
             
             # Generate embedding
-            embedding = await self.encode_text(conversation_text)
+            try:
+                embedding = await self.encode_text(conversation_text)
+            except EmbeddingError as e:
+                self._defer_embedding('conversation', user_id, conversation_text, None, str(e))
+                return np.zeros(self.embedding_dim)
             
             # Store in context cache
             await self._store_conversation_embedding(user_id, conversation_text, embedding)
@@ -137,31 +229,91 @@ class EmbeddingsService:
             logging.error(f"Error encoding conversation: {str(e)}")
             return np.zeros(self.embedding_dim)
     
+    def pending_count(self) -> int:
+        """Number of behaviors/conversations waiting to be re-embedded"""
+        return len(self.pending)
+    
+    def _defer_embedding(self, kind: str, user_id: str, text: str, behavior_data: Optional[Dict[str, Any]], error: str):
+        """Queue an item whose embedding failed and make sure the retry task is running"""
+        logging.warning(f"Deferring {kind} embedding for user {user_id}: {error}")
+        self.pending.append({
+            'kind': kind,
+            'user_id': user_id,
+            'text': text,
+            'behavior_data': behavior_data,
+            'attempts': 1,
+            'next_attempt_at': time.time() + self.retry_backoff.delay(1)
+        })
+        if self._retry_task is None or self._retry_task.done():
+            self._retry_task = asyncio.get_event_loop().create_task(self._retry_pending_loop())
+    
+    async def retry_pending(self) -> int:
+        """
+        Re-encode and store pending items that are due
+        
+        Items whose database write fails stay queued and are retried with backoff.
+        
+        Returns:
+            Number of items that were embedded and stored
+        """
+        now = time.time()
+        due = [item for item in self.pending if item['next_attempt_at'] <= now]
+        if not due:
+            return 0
+        
+        try:
+            embeddings = await self.encode_batch([item['text'] for item in due])
+        except EmbeddingError as e:
+            for item in due:
+                item['attempts'] += 1
+                item['next_attempt_at'] = now + self.retry_backoff.delay(item['attempts'])
+            logging.warning(f"Retry of {len(due)} pending embeddings failed: {str(e)}")
+            return 0
+        
+        stored = 0
+        for item, embedding in zip(due, embeddings):
+            if item['kind'] == 'behavior':
+                ok = await self._store_behavior_embedding(item['user_id'], item['behavior_data'], embedding)
+            else:
+                ok = await self._store_conversation_embedding(item['user_id'], item['text'], embedding)
+            if ok:
+                self.pending.remove(item)
+                stored += 1
+            else:
+                item['attempts'] += 1
+                item['next_attempt_at'] = time.time() + self.retry_backoff.delay(item['attempts'])
+        
+        return stored
+    
+    async def _retry_pending_loop(self):
+        """Drain the pending queue, sleeping until the next item is due"""
+        failures = 0
+        while self.pending:
+            try:
+                await self.retry_pending()
+                failures = 0
+            except Exception as e:
+                # Unexpected error; keep the items and back off
+                failures += 1
+                logging.error(f"Error retrying pending embeddings: {str(e)}")
+                await asyncio.sleep(self.retry_backoff.delay(failures))
+                continue
+            if self.pending:
+                next_due = min(item['next_attempt_at'] for item in self.pending)
+                await asyncio.sleep(max(0.1, next_due - time.time()))
+    
     async def find_similar_behaviors(self, user_id: str, query_embedding: np.ndarray, top_k: int = 5) -> List[Dict[str, Any]]:
         """
         Find similar user behaviors using semantic search
         """
         try:
-            # Get user's behavior embeddings from database
-            behavior_embeddings = await self._get_user_behavior_embeddings(user_id)
-            
-            if not behavior_embeddings:
-                return []
-            
-            # Calculate cosine similarities
-            similarities = []
-            for behavior in behavior_embeddings:
-                if behavior.get('embedding'):
-                    stored_embedding = np.array(behavior['embedding'])
-                    similarity = self._cosine_similarity(query_embedding, stored_embedding)
-                    similarities.append({
-                        'behavior': behavior,
-                        'similarity': similarity
-                    })
-            
-            # Sort by similarity and return top_k
-            similarities.sort(key=lambda x: x['similarity'], reverse=True)
-            return similarities[:top_k]
+            # Get user's behavior embeddings as one matrix (cached per user)
+            behaviors, matrix = await self._user_embedding_matrix('behavior', user_id)
+            
+            return [
+                {'behavior': behaviors[i], 'similarity': similarity}
+                for i, similarity in self._top_k_similar(query_embedding, matrix, top_k)
+            ]
             
         except Exception as e:
             logging.error(f"Error finding similar behaviors: {str(e)}")
@@ -172,26 +324,13 @@ class EmbeddingsService:
         Find similar conversations for context-aware responses
         """
         try:
-            # Get user's conversation embeddings from cache
-            conversation_embeddings = await self._get_user_conversation_embeddings(user_id)
-            
-            if not conversation_embeddings:
-                return []
-            
-            # Calculate similarities
-            similarities = []
-            for conversation in conversation_embeddings:
-                if conversation.get('embedding'):
-                    stored_embedding = np.array(conversation['embedding'])
-                    similarity = self._cosine_similarity(query_embedding, stored_embedding)
-                    similarities.append({
-                        'conversation': conversation,
-                        'similarity': similarity
-                    })
-            
-            # Sort and return top_k
-            similarities.sort(key=lambda x: x['similarity'], reverse=True)
-            return similarities[:top_k]
+            # Get user's conversation embeddings as one matrix (cached per user)
+            conversations, matrix = await self._user_embedding_matrix('conversation', user_id)
+            
+            return [
+                {'conversation': conversations[i], 'similarity': similarity}
+                for i, similarity in self._top_k_similar(query_embedding, matrix, top_k)
+            ]
             
         except Exception as e:
             logging.error(f"Error finding similar conversations: {str(e)}")
@@ -202,6 +341,14 @@ class EmbeddingsService:
         Analyze user behavior patterns using embeddings clustering
         """
         try:
+            # Reuse the last analysis until new behaviors arrive
+            cache_key = (user_id, timeframe_days)
+            version = (self._behavior_versions.get(user_id, 0), datetime.now().date())
+            cached = self._pattern_cache.get(cache_key)
+            if cached is not None and cached[0] == version:
+                self._pattern_cache.move_to_end(cache_key)
+                return cached[1]
+            
             # Get recent behavior embeddings
             behaviors = await self._get_recent_behavior_embeddings(user_id, timeframe_days)
             
@@ -220,13 +367,20 @@ class EmbeddingsService:
             # Generate insights from clusters
             insights = await self._generate_pattern_insights(behaviors, clusters)
             
-            return {
+            result = {
                 "patterns": clusters,
                 "clusters": len(clusters),
                 "insights": insights,
                 "total_behaviors": len(behaviors)
             }
             
+            self._pattern_cache[cache_key] = (version, result)
+            self._pattern_cache.move_to_end(cache_key)
+            while len(self._pattern_cache) > self.mirror.max_users:
+                self._pattern_cache.popitem(last=False)
+            
+            return result
+            
         except Exception as e:
             logging.error(f"Error analyzing behavior patterns: {str(e)}")
             return {"patterns": [], "clusters": 0, "insights": []}
@@ -333,49 +487,119 @@ class EmbeddingsService:
         except Exception:
             return 0.0
     
-    async def _store_behavior_embedding(self, user_id: str, behavior_data: Dict[str, Any], embedding: np.ndarray):
-        """Store behavior embedding in database"""
+    def _top_k_similar(self, query_embedding: np.ndarray, matrix: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        """
+        Cosine top-k against a matrix of normalized rows
+        
+        Returns:
+            (row index, similarity) pairs, most similar first
+        """
+        if matrix.shape[0] == 0 or top_k <= 0:
+            return []
+        
+        query = np.asarray(query_embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        if norm > 0:
+            query = query / norm
+        
+        scores = matrix @ query
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+    
+    async def _user_embedding_matrix(self, kind: str, user_id: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+        """
+        A user's stored behavior/conversation rows and their embeddings
+        stacked into one L2-normalized float32 matrix
+        
+        Served from the local mirror; Supabase is only read the first time
+        a user is searched (or after EMBEDDINGS_USER_CACHE_TTL, if set).
+        """
+        mirrored = self.mirror.get(kind, user_id)
+        if mirrored is not None:
+            return mirrored
+        
+        if kind == 'behavior':
+            records = await self._get_user_behavior_embeddings(user_id)
+        else:
+            records = await self._get_user_conversation_embeddings(user_id)
+        if records is None:
+            # The fetch failed; don't mirror it, so the next search retries
+            return [], np.zeros((0, self.embedding_dim), dtype=np.float32)
+        
+        rows, vectors = [], []
+        for record in records:
+            embedding = self._parse_embedding(record.get('embedding'))
+            if embedding is not None and embedding.shape[0] == self.embedding_dim:
+                rows.append(record)
+                vectors.append(embedding)
+        
+        # Users with no rows are mirrored as empty until invalidated or the TTL expires
+        self.mirror.load(kind, user_id, rows, vectors, self.embedding_dim)
+        return self.mirror.get(kind, user_id)
+    
+    @staticmethod
+    def _parse_embedding(value: Any) -> Optional[np.ndarray]:
+        """Decode a stored embedding (list, or pgvector/JSON string)"""
+        if value is None or len(value) == 0:
+            return None
+        if isinstance(value, str):
+            value = json.loads(value)
+        return np.asarray(value, dtype=np.float32)
+    
+    async def _store_behavior_embedding(self, user_id: str, behavior_data: Dict[str, Any], embedding: np.ndarray) -> bool:
+        """Store behavior embedding in database; returns whether the write succeeded"""
         try:
-            await self.supabase.table('behavior_data').insert({
+            row = {
                 'user_id': user_id,
                 'activity_type': behavior_data.get('activity_type', 'unknown'),
                 'data': json.dumps(behavior_data),
                 'embedding': embedding.tolist(),
                 'timestamp': datetime.now().isoformat()
-            }).execute()
+            }
+            await self.supabase.table('behavior_data').insert(row).execute()
+            self.mirror.append('behavior', user_id, row, embedding)
+            self._behavior_versions[user_id] = self._behavior_versions.get(user_id, 0) + 1
+            return True
         except Exception as e:
             logging.error(f"Error storing behavior embedding: {str(e)}")
+            return False
     
-    async def _store_conversation_embedding(self, user_id: str, conversation_text: str, embedding: np.ndarray):
-        """Store conversation embedding in context cache"""
+    async def _store_conversation_embedding(self, user_id: str, conversation_text: str, embedding: np.ndarray) -> bool:
+        """Store conversation embedding in context cache; returns whether the write succeeded"""
         try:
-            await self.supabase.table('ai_context_cache').insert({
+            row = {
                 'user_id': user_id,
                 'context_type': 'conversation',
                 'context_data': json.dumps({'text': conversation_text}),
                 'embedding': embedding.tolist(),
                 'created_at': datetime.now().isoformat()
-            }).execute()
+            }
+            await self.supabase.table('ai_context_cache').insert(row).execute()
+            self.mirror.append('conversation', user_id, row, embedding)
+            return True
         except Exception as e:
             logging.error(f"Error storing conversation embedding: {str(e)}")
+            return False
     
-    async def _get_user_behavior_embeddings(self, user_id: str) -> List[Dict[str, Any]]:
-        """Get user's behavior embeddings from database"""
+    async def _get_user_behavior_embeddings(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Get user's behavior embeddings from database (None if the query failed)"""
         try:
             response = await self.supabase.table('behavior_data').select('*').eq('user_id', user_id).order('timestamp', desc=True).limit(50).execute()
             return response.data or []
         except Exception as e:
             logging.error(f"Error getting behavior embeddings: {str(e)}")
-            return []
+            return None
     
-    async def _get_user_conversation_embeddings(self, user_id: str) -> List[Dict[str, Any]]:
-        """Get user's conversation embeddings from cache"""
+    async def _get_user_conversation_embeddings(self, user_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Get user's conversation embeddings from cache (None if the query failed)"""
         try:
             response = await self.supabase.table('ai_context_cache').select('*').eq('user_id', user_id).eq('context_type', 'conversation').order('created_at', desc=True).limit(20).execute()
             return response.data or []
         except Exception as e:
             logging.error(f"Error getting conversation embeddings: {str(e)}")
-            return []
+            return None
     
     async def _get_recent_behavior_embeddings(self, user_id: str, days: int) -> List[Dict[str, Any]]:
         """Get recent behavior embeddings for pattern analysis"""
@@ -392,40 +616,26 @@ class EmbeddingsService:
     async def _cluster_embeddings(self, embeddings: List[np.ndarray]) -> List[Dict[str, Any]]:
         """Cluster embeddings to find behavior patterns"""
         try:
-            from sklearn.cluster import KMeans
-            from sklearn.metrics import silhouette_score
-            
             # Convert to numpy array
-            embeddings_array = np.array(embeddings)
-            
-            # Determine optimal number of clusters
-            max_clusters = min(8, len(embeddings) // 2)
-            best_clusters = 2
-            best_score = -1
-            
-            for n_clusters in range(2, max_clusters + 1):
-                kmeans = KMeans(n_clusters=n_clusters, random_state=42)
-                cluster_labels = kmeans.fit_predict(embeddings_array)
-                score = silhouette_score(embeddings_array, cluster_labels)
-                
-                if score > best_score:
-                    best_score = score
-                    best_clusters = n_clusters
-            
-            # Perform final clustering
-            kmeans = KMeans(n_clusters=best_clusters, random_state=42)
-            cluster_labels = kmeans.fit_predict(embeddings_array)
+            embeddings_array = np.asarray(embeddings, dtype=np.float32)
+            
+            # Fit every candidate number of clusters in parallel and keep the best fit
+            max_clusters = max(2, min(8, len(embeddings) // 2))
+            loop = asyncio.get_event_loop()
+            candidates = await asyncio.gather(*[
+                loop.run_in_executor(self.executor, self._fit_clusters, embeddings_array, n_clusters)
+                for n_clusters in range(2, max_clusters + 1)
+            ])
+            best_score, best_clusters, cluster_labels, cluster_centers = max(candidates, key=lambda c: c[0])
             
             # Group embeddings by cluster
+            sizes = np.bincount(cluster_labels, minlength=best_clusters)
             clusters = []
             for i in range(best_clusters):
-                cluster_embeddings = embeddings_array[cluster_labels == i]
-                cluster_center = kmeans.cluster_centers_[i]
-                
                 clusters.append({
                     'cluster_id': i,
-                    'size': len(cluster_embeddings),
-                    'center': cluster_center.tolist(),
+                    'size': int(sizes[i]),
+                    'center': cluster_centers[i].tolist(),
                     'cohesion': float(best_score)
                 })
             
@@ -435,6 +645,33 @@ class EmbeddingsService:
             logging.error(f"Error clustering embeddings: {str(e)}")
             return []
     
+    @staticmethod
+    def _fit_clusters(embeddings_array: np.ndarray, n_clusters: int) -> Tuple[float, int, np.ndarray, np.ndarray]:
+        """
+        Fit one candidate clustering and score it
+        
+        Uses MiniBatchKMeans and a silhouette score on at most 1000 sampled
+        points, so the cost stays flat for users with thousands of events.
+        
+        Returns:
+            (silhouette score, n_clusters, labels, centers)
+        """
+        from sklearn.cluster import MiniBatchKMeans
+        from sklearn.metrics import silhouette_score
+        
+        kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=1024, n_init=3, random_state=42)
+        cluster_labels = kmeans.fit_predict(embeddings_array)
+        
+        if len(set(cluster_labels)) < 2 or len(embeddings_array) <= n_clusters:
+            score = -1.0
+        else:
+            score = silhouette_score(
+                embeddings_array, cluster_labels,
+                sample_size=min(len(embeddings_array), 1000), random_state=42
+            )
+        
+        return float(score), n_clusters, cluster_labels, kmeans.cluster_centers_
+    
     async def _generate_pattern_insights(self, behaviors: List[Dict[str, Any]], clusters: List[Dict[str, Any]]) -> List[str]:
         """Generate insights from behavior patterns"""
         insights = []
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tiered health checks
+Liveness is free, readiness is served from backend probes refreshed in the
+background, and the expensive deep check (a real embedding + generation)
+only runs on demand and is rate limited
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Any, Optional
+
+Probe = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class HealthMonitor:
+    def __init__(self, probes: Dict[str, Probe], interval: float = 15.0, timeout: float = 2.0,
+                 deep_check: Optional[Probe] = None, deep_check_min_interval: float = 30.0):
+        """
+        Initialize the monitor
+
+        Args:
+            probes: Cheap backend checks by name; each returns a dict with
+                    "status": "operational" or raises
+            interval: Seconds between background probe rounds
+            timeout: Per-probe timeout in seconds
+            deep_check: Expensive end-to-end check run only on demand
+            deep_check_min_interval: Deep check results are reused for this many seconds
+        """
+        self.probes = probes
+        self.interval = interval
+        self.timeout = timeout
+        self.deep_check = deep_check
+        self.deep_check_min_interval = deep_check_min_interval
+
+        self.started_at = time.monotonic()
+        self.results: Dict[str, Dict[str, Any]] = {}
+        self.checked_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        self._deep_result: Optional[Dict[str, Any]] = None
+        self._deep_checked_at = 0.0
+        self._deep_lock: Optional[asyncio.Lock] = None
+
+    def start(self):
+        """Start the background refresh loop (needs a running event loop)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def refresh(self):
+        """Run every probe concurrently and store the results"""
+        names = list(self.probes)
+        results = await asyncio.gather(*[self._probe(self.probes[name]) for name in names])
+        self.results = dict(zip(names, results))
+        self.checked_at = time.monotonic()
+
+    def liveness(self) -> Dict[str, Any]:
+        """The process is up and the event loop is responsive"""
+        return {
+            "status": "alive",
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    async def readiness(self) -> Dict[str, Any]:
+        """
+        Readiness from the cached probe results
+
+        Only the first call waits for a probe round; afterwards results come
+        from the background loop and are considered stale after 3 intervals.
+        """
+        self.start()
+        if self.checked_at is None:
+            await self.refresh()
+
+        age = time.monotonic() - self.checked_at
+        fresh = age < 3 * self.interval
+        ready = fresh and all(result["status"] == "operational" for result in self.results.values())
+        return {
+            "status": "ready" if ready else "not ready",
+            "ready": ready,
+            "services": self.results,
+            "checked_seconds_ago": round(age, 1),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    async def deep(self) -> Dict[str, Any]:
+        """Run the deep check, reusing a recent result so probes can't pile up load"""
+        if self.deep_check is None:
+            return {"status": "not configured"}
+
+        if self._deep_lock is None:
+            self._deep_lock = asyncio.Lock()
+        async with self._deep_lock:
+            if self._deep_result is None or time.monotonic() - self._deep_checked_at >= self.deep_check_min_interval:
+                # Deep checks include a real generation, so allow far more than the probe timeout
+                self._deep_result = await self._probe(self.deep_check, timeout=max(self.timeout, 60.0))
+                self._deep_checked_at = time.monotonic()
+        return self._deep_result
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Error refreshing health probes: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _probe(self, probe: Probe, timeout: Optional[float] = None) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(probe(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            result = {"status": "error: timed out"}
+        except Exception as e:
+            result = {"status": f"error: {str(e)}"}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        result["checked_at"] = datetime.now().isoformat()
+        return result
@@ -8,6 +8,9 @@ import logging
 from datetime import datetime
 import json
 
+from admission import AdmissionController, AdmissionRejected, Priority
+from config.ai_config import LLM_MAX_CONCURRENT, LLM_QUEUE_SIZE, LLM_QUEUE_TIMEOUT, LLM_QUEUE_PER_USER
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -28,6 +31,16 @@ app.add_middleware(
 openai.api_key = os.getenv("OPENAI_API_KEY")  # or GROQ_API_KEY
 openai.api_base = os.getenv("OPENAI_API_BASE", "https://api.openai.com/v1")
 
+# Bounds concurrent completions; excess requests queue briefly, then get the fallback
+admission = AdmissionController(
+    max_concurrent=LLM_MAX_CONCURRENT,
+    max_queue=LLM_QUEUE_SIZE,
+    max_wait=LLM_QUEUE_TIMEOUT,
+    max_queued_per_user=LLM_QUEUE_PER_USER
+)
+
+FALLBACK_RESPONSE = "I'm here to help! I understand you're reaching out, and I want to support you. Could you tell me a bit more about what's on your mind today?"
+
 # Request/Response models
 class ChatPayload(BaseModel):
     user_id: str
@@ -49,6 +62,7 @@ class CheckInPayload(BaseModel):
 class HealthCheck(BaseModel):
     status: str
     timestamp: str
+    admission: Optional[Dict[str, Any]] = None
 
 # Mock user context storage (replace with actual database)
 user_contexts = {}
@@ -89,7 +103,7 @@ def get_claude_response(prompt: str, context: Optional[Dict] = None) -> str:
     except Exception as e:
         logger.error(f"Claude API error: {e}")
         # Fallback response
-        return "I'm here to help! I understand you're reaching out, and I want to support you. Could you tell me a bit more about what's on your mind today?"
+        return FALLBACK_RESPONSE
 
 async def get_user_context(user_id: str) -> Dict[str, Any]:
     """
@@ -114,7 +128,8 @@ async def health_check():
     """Health check endpoint"""
     return HealthCheck(
         status="healthy",
-        timestamp=datetime.now().isoformat()
+        timestamp=datetime.now().isoformat(),
+        admission=admission.stats()
     )
 
 @app.post("/chat", response_model=ChatResponse)
@@ -130,8 +145,14 @@ async def chat(payload: ChatPayload):
         if payload.context:
             user_context.update(payload.context)
         
-        # Generate AI response
-        ai_response = get_claude_response(payload.message, user_context)
+        # Generate AI response in a worker thread, behind the admission queue
+        try:
+            ai_response = await admission.run_in_thread(
+                payload.user_id, get_claude_response, payload.message, user_context, priority=Priority.INTERACTIVE
+            )
+        except AdmissionRejected as e:
+            logger.warning(f"Chat request shed ({e.reason}): {e}")
+            ai_response = FALLBACK_RESPONSE
         
         # Store conversation context for future use
         user_contexts[payload.user_id] = user_context
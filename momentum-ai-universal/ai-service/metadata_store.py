@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+SQLite-backed document metadata store
+Keeps per-document metadata on disk and hydrates rows lazily by id
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Iterable
+
+# Metadata keys stored in their own indexed columns; everything else goes
+# into the JSON `extra` column.
+COLUMNS = ("user_id", "data_type", "timestamp", "text")
+
+
+class MetadataStore:
+    def __init__(self, db_path: str):
+        """
+        Open (or create) the metadata database
+
+        Args:
+            db_path: Path to the SQLite file
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                user_id TEXT,
+                data_type TEXT,
+                timestamp TEXT,
+                text TEXT,
+                extra TEXT
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_documents_user_type ON documents (user_id, data_type)"
+        )
+        # Documents whose embedding failed; they get a doc id once embedded
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pending_documents (
+                pending_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                document TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT
+            )
+            """
+        )
+        self._conn.commit()
+        self._count = self._next_id()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, documents: Iterable[Dict[str, Any]]):
+        """
+        Insert documents in a single transaction
+
+        Args:
+            documents: Metadata dicts, each with an integer "id"
+        """
+        rows = [self._to_row(doc) for doc in documents]
+        if not rows:
+            return
+
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO documents (id, user_id, data_type, timestamp, text, extra) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+            self._count = self._next_id()
+
+    def get(self, doc_id: int) -> Optional[Dict[str, Any]]:
+        """Load a single document's metadata"""
+        return self.get_many([doc_id]).get(doc_id)
+
+    def get_many(self, doc_ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Load metadata for the given ids only
+
+        Returns:
+            Mapping of doc id -> metadata (missing ids are omitted)
+        """
+        doc_ids = [int(doc_id) for doc_id in doc_ids]
+        if not doc_ids:
+            return {}
+
+        placeholders = ",".join("?" * len(doc_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, user_id, data_type, timestamp, text, extra FROM documents WHERE id IN ({placeholders})",
+                doc_ids
+            ).fetchall()
+
+        return {row[0]: self._from_row(row) for row in rows}
+
+    def ids_for(self, user_id: str, data_type: Optional[str] = None) -> List[int]:
+        """Doc ids belonging to a user, optionally restricted to one data type"""
+        with self._lock:
+            if data_type is None:
+                rows = self._conn.execute(
+                    "SELECT id FROM documents WHERE user_id = ?", (user_id,)
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT id FROM documents WHERE user_id = ? AND data_type = ?", (user_id, data_type)
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def ids_by_type(self, user_id: str, data_types: List[str]) -> Dict[str, List[int]]:
+        """Doc ids of a user grouped by data type, in one query"""
+        grouped = {data_type: [] for data_type in data_types}
+        if not data_types:
+            return grouped
+
+        placeholders = ",".join("?" * len(data_types))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, data_type FROM documents WHERE user_id = ? AND data_type IN ({placeholders})",
+                [user_id, *data_types]
+            ).fetchall()
+
+        for doc_id, data_type in rows:
+            grouped[data_type].append(doc_id)
+        return grouped
+
+    def import_json(self, json_path: str) -> int:
+        """
+        One-off migration from the legacy metadata.json list
+
+        Returns:
+            Number of imported documents
+        """
+        with open(json_path, 'r') as f:
+            documents = json.load(f)
+        self.add(documents)
+        return len(documents)
+
+    def add_pending(self, documents: List[Dict[str, Any]], error: str, retry_at: float):
+        """
+        Park documents that could not be embedded yet
+
+        Args:
+            documents: {"text": ..., "metadata": {...}} dicts
+            error: Reason the embedding failed
+            retry_at: Unix time of the first retry
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO pending_documents (document, attempts, next_attempt_at, last_error) "
+                    "VALUES (?, 1, ?, ?)",
+                    [(json.dumps(doc), retry_at, error) for doc in documents]
+                )
+
+    def due_pending(self, limit: int = 32) -> List[tuple]:
+        """
+        Pending documents whose retry time has come
+
+        Returns:
+            (pending_id, document, attempts) tuples, oldest first
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT pending_id, document, attempts FROM pending_documents "
+                "WHERE next_attempt_at <= ? ORDER BY pending_id LIMIT ?",
+                (time.time(), limit)
+            ).fetchall()
+        return [(pending_id, json.loads(document), attempts) for pending_id, document, attempts in rows]
+
+    def reschedule_pending(self, pending_ids: List[int], attempts: int, retry_at: float, error: str):
+        """Record another failed attempt and push the next retry back"""
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE pending_documents SET attempts = ?, next_attempt_at = ?, last_error = ? "
+                    "WHERE pending_id = ?",
+                    [(attempts, retry_at, error, pending_id) for pending_id in pending_ids]
+                )
+
+    def remove_pending(self, pending_ids: List[int]):
+        """Drop documents that have been embedded and indexed"""
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "DELETE FROM pending_documents WHERE pending_id = ?",
+                    [(pending_id,) for pending_id in pending_ids]
+                )
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pending_documents").fetchone()[0]
+
+    def _next_id(self) -> int:
+        # Doc ids are dense row numbers of the vector index, so MAX(id) + 1
+        # is the row count without a full table scan
+        max_id = self._conn.execute("SELECT MAX(id) FROM documents").fetchone()[0]
+        return 0 if max_id is None else max_id + 1
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _to_row(doc: Dict[str, Any]) -> tuple:
+        extra = {key: value for key, value in doc.items() if key != "id" and key not in COLUMNS}
+        return (
+            int(doc["id"]),
+            doc.get("user_id"),
+            doc.get("data_type"),
+            doc.get("timestamp"),
+            doc.get("text"),
+            json.dumps(extra)
+        )
+
+    @staticmethod
+    def _from_row(row: tuple) -> Dict[str, Any]:
+        doc_id, user_id, data_type, timestamp, text, extra = row
+        doc = {"id": doc_id, "text": text, "timestamp": timestamp}
+        if user_id is not None:
+            doc["user_id"] = user_id
+        if data_type is not None:
+            doc["data_type"] = data_type
+        doc.update(json.loads(extra) if extra else {})
+        return doc
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Async Ollama client
+Non-blocking embeddings and generation for FastAPI handlers, sharing one
+pooled httpx.AsyncClient per event loop and the circuit breaker of the
+synchronous Ollama transport
+"""
+import asyncio
+import json
+import numpy as np
+import httpx
+from typing import AsyncIterator, Dict, Any, List, Optional
+
+from config.ai_config import OLLAMA_HOST, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT, OLLAMA_MAX_RETRIES
+from embedding_retry import EmbeddingError
+from ollama_transport import CircuitBreaker, CircuitOpenError, RETRYABLE_STATUSES, get_transport
+
+
+class AsyncOllamaClient:
+    def __init__(self, base_url: str = OLLAMA_HOST, timeout: float = OLLAMA_READ_TIMEOUT,
+                 connect_timeout: float = OLLAMA_CONNECT_TIMEOUT, max_connections: int = 32,
+                 max_keepalive: int = 16, retries: int = OLLAMA_MAX_RETRIES,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Initialize the client
+
+        Args:
+            base_url: Ollama server URL
+            timeout: Read/write timeout in seconds (between chunks when streaming)
+            connect_timeout: Connection timeout in seconds
+            max_connections: Upper bound on concurrent connections to Ollama
+            max_keepalive: Idle connections kept in the pool
+            retries: Extra attempts when a connection cannot be established
+            breaker: Circuit breaker (defaults to the shared transport's for base_url)
+        """
+        self.base_url = base_url
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.retries = retries
+        self.breaker = breaker or get_transport(base_url).breaker
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Created on first use (and per loop) since pooled connections are bound to their event loop
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                transport=httpx.AsyncHTTPTransport(limits=self.limits, retries=self.retries)
+            )
+            self._loop = loop
+        return self._client
+
+    async def embed_batch(self, model: str, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts with one /api/embed request
+
+        Returns:
+            (len(texts), dim) array of L2-normalized float32 embeddings
+
+        Raises:
+            EmbeddingError when Ollama fails or returns a malformed response
+        """
+        try:
+            response = await self._post("/api/embed", json={"model": model, "input": texts})
+            response.raise_for_status()
+            vectors = np.array(response.json()["embeddings"], dtype=np.float32)
+        except (httpx.HTTPError, CircuitOpenError, ValueError, KeyError) as e:
+            raise EmbeddingError(f"Ollama embedding request failed: {e}") from e
+
+        if vectors.ndim != 2 or vectors.shape[0] != len(texts):
+            raise EmbeddingError(f"Expected {len(texts)} embeddings, got shape {vectors.shape}")
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    async def embed(self, model: str, text: str) -> np.ndarray:
+        """Embed a single text"""
+        return (await self.embed_batch(model, [text]))[0]
+
+    async def generate(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Non-streaming /api/generate call
+
+        Raises:
+            CircuitOpenError while the circuit breaker is open
+            httpx.HTTPError when Ollama fails
+        """
+        response = await self._post("/api/generate", json={**payload, "stream": False})
+        response.raise_for_status()
+        return response.json()
+
+    async def generate_stream(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Streaming /api/generate call, yielding text fragments as they arrive
+
+        Raises:
+            CircuitOpenError while the circuit breaker is open
+            httpx.HTTPError when Ollama fails
+        """
+        self._check_breaker("/api/generate")
+        try:
+            async with self.client.stream("POST", "/api/generate", json={**payload, "stream": True}) as response:
+                self._record(response.status_code)
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise httpx.HTTPError(chunk["error"])
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+
+    async def version(self, timeout: float = 2.0) -> str:
+        """
+        Ollama server version; a cheap reachability probe
+
+        Bypasses the circuit breaker so health checks still see a recovered server.
+
+        Raises:
+            httpx.HTTPError when Ollama is unreachable
+        """
+        response = await self.client.get("/api/version", timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("version", "unknown")
+
+    async def _post(self, path: str, **kwargs) -> httpx.Response:
+        self._check_breaker(path)
+        try:
+            response = await self.client.post(path, **kwargs)
+        except httpx.TransportError:
+            self.breaker.record_failure()
+            raise
+        self._record(response.status_code)
+        return response
+
+    def _check_breaker(self, path: str):
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"Ollama circuit open; not calling {path}")
+
+    def _record(self, status_code: int):
+        if status_code in RETRYABLE_STATUSES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
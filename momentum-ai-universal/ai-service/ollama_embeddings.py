@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Batched Ollama embeddings client
+Coalesces concurrent single-text requests into micro-batches sent to
+Ollama's /api/embed endpoint over the shared Ollama transport
+"""
+import queue
+import threading
+import time
+import numpy as np
+import requests
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import List, Optional, Tuple
+
+from config.ai_config import OLLAMA_HOST
+from embedding_retry import EmbeddingError
+from ollama_transport import OllamaTransport, get_transport
+
+
+class OllamaEmbeddingClient:
+    def __init__(self, model: str = "nomic-embed-text", base_url: str = OLLAMA_HOST,
+                 max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 timeout: float = 30.0, transport: Optional[OllamaTransport] = None):
+        """
+        Initialize the embeddings client
+
+        Args:
+            model: Ollama embedding model
+            base_url: Ollama server URL
+            max_batch_size: Texts per /api/embed request
+            max_wait_ms: How long a single-text call waits for others to join its batch
+            timeout: Per-request read timeout in seconds
+            transport: HTTP transport (defaults to the shared one for base_url)
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self.transport = transport or get_transport(base_url)
+
+        self._pending: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+
+    def embed_batch(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed texts with one request per max_batch_size chunk
+
+        Returns:
+            (len(texts), dim) array of L2-normalized float32 embeddings
+
+        Raises:
+            EmbeddingError when Ollama fails or returns a malformed response
+        """
+        chunks = []
+        for start in range(0, len(texts), self.max_batch_size):
+            batch = texts[start:start + self.max_batch_size]
+            try:
+                response = self.transport.post(
+                    "/api/embed",
+                    json={"model": self.model, "input": batch},
+                    timeout=(self.transport.timeout[0], self.timeout)
+                )
+                response.raise_for_status()
+                vectors = np.array(response.json()["embeddings"], dtype=np.float32)
+            except (requests.RequestException, ValueError, KeyError) as e:
+                raise EmbeddingError(f"Ollama embedding request failed: {e}") from e
+
+            if vectors.ndim != 2 or vectors.shape[0] != len(batch):
+                raise EmbeddingError(f"Expected {len(batch)} embeddings, got shape {vectors.shape}")
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            chunks.append(vectors / norms)
+
+        return np.vstack(chunks) if chunks else np.zeros((0, 0), dtype=np.float32)
+
+    def embed(self, text: str) -> np.ndarray:
+        """
+        Embed one text, sharing a request with concurrent callers
+
+        Blocks until the micro-batch containing this text has been embedded.
+
+        Raises:
+            EmbeddingError when the batch fails
+        """
+        future: Future = Future()
+        self._ensure_worker()
+        self._pending.put((text, future))
+        # Allow for the transport's retries before giving up on the batch
+        try:
+            return future.result(timeout=(self.timeout + self.max_wait + 5) * (self.transport.max_retries + 1))
+        except FutureTimeoutError as e:
+            # A late batch result is dropped instead of being set on a dead future
+            future.cancel()
+            raise EmbeddingError("Timed out waiting for the embedding batch") from e
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="ollama-embed-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        """Gather queued texts for up to max_wait, then embed them in one call"""
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                pass
+
+            # Skip callers that already gave up
+            batch = [(text, future) for text, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            texts = [text for text, _ in batch]
+            try:
+                embeddings = self.embed_batch(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP transport for Ollama
+One keep-alive connection pool per Ollama host, per-call timeouts, jittered
+retries for connection failures and a circuit breaker so callers fail fast
+while Ollama is down or overloaded instead of piling up blocked threads
+"""
+import sys
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from typing import Dict, Any, Optional, Tuple, Union
+
+# Imported both flat (`ollama_transport`, by the ai-service scripts) and
+# package-qualified (`ai_service.ollama_transport`, by services/). Register the
+# module under both names so every caller gets the same module, and therefore
+# the same transports and circuit breakers.
+for _alias in ("ollama_transport", "ai_service.ollama_transport"):
+    sys.modules.setdefault(_alias, sys.modules[__name__])
+
+try:
+    from .config.ai_config import (
+        OLLAMA_HOST, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT, OLLAMA_MAX_RETRIES, OLLAMA_POOL_SIZE,
+        OLLAMA_BREAKER_THRESHOLD, OLLAMA_BREAKER_RESET
+    )
+    from .embedding_retry import Backoff
+except ImportError:  # loaded as a top-level module
+    from config.ai_config import (
+        OLLAMA_HOST, OLLAMA_CONNECT_TIMEOUT, OLLAMA_READ_TIMEOUT, OLLAMA_MAX_RETRIES, OLLAMA_POOL_SIZE,
+        OLLAMA_BREAKER_THRESHOLD, OLLAMA_BREAKER_RESET
+    )
+    from embedding_retry import Backoff
+
+Timeout = Union[float, Tuple[float, float]]
+
+# Statuses Ollama returns while overloaded or restarting; safe to retry
+RETRYABLE_STATUSES = {502, 503, 504}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling Ollama while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Initialize the breaker
+
+        Args:
+            failure_threshold: Consecutive failed calls before the circuit opens
+            reset_timeout: Seconds the circuit stays open before one trial call is let through
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.times_opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go out now; while half open only one trial call is allowed"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.times_opened += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "failure_threshold": self.failure_threshold,
+            "reset_timeout": self.reset_timeout,
+            "rejected": self.rejected,
+            "times_opened": self.times_opened
+        }
+
+
+class OllamaTransport:
+    def __init__(self, base_url: str = OLLAMA_HOST, connect_timeout: float = OLLAMA_CONNECT_TIMEOUT,
+                 read_timeout: float = OLLAMA_READ_TIMEOUT, max_retries: int = OLLAMA_MAX_RETRIES,
+                 pool_size: int = OLLAMA_POOL_SIZE, breaker: Optional[CircuitBreaker] = None,
+                 backoff: Optional[Backoff] = None):
+        """
+        Initialize the transport
+
+        Args:
+            base_url: Ollama server URL
+            connect_timeout: Default connection timeout in seconds
+            read_timeout: Default read timeout in seconds (between chunks when streaming)
+            max_retries: Extra attempts after a connection failure or 502/503/504
+            pool_size: Keep-alive connections kept in the pool
+            breaker: Circuit breaker; shared by every caller of this host
+            backoff: Delay policy between retries
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.breaker = breaker or CircuitBreaker(OLLAMA_BREAKER_THRESHOLD, OLLAMA_BREAKER_RESET)
+        self.backoff = backoff or Backoff(base_delay=0.25, max_delay=2.0)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def request(self, method: str, path: str, timeout: Optional[Timeout] = None,
+                retries: Optional[int] = None, **kwargs) -> requests.Response:
+        """
+        Send a request through the pool
+
+        Only failures before a response arrives (connection errors, connect
+        timeouts) and 502/503/504 are retried; read timeouts are not, since
+        retrying a slow generation only adds load. For stream=True calls,
+        errors while reading the body are up to the caller.
+
+        Args:
+            method: HTTP method
+            path: Path under base_url, e.g. "/api/generate"
+            timeout: Seconds, or (connect, read); defaults to the transport's
+            retries: Overrides max_retries for this call (0 for probes)
+            **kwargs: Passed to requests.Session.request (json, stream, ...)
+
+        Returns:
+            The response; status is not checked beyond retryable 5xx
+
+        Raises:
+            CircuitOpenError when the breaker is open
+            requests.RequestException when Ollama cannot be reached
+        """
+        url = f"{self.base_url}{path}"
+        retries = self.max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Ollama circuit open; not calling {path}")
+            self.requests += 1
+            try:
+                response = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.ConnectionError:
+                self._failed()
+                if attempt >= retries:
+                    raise
+            except requests.RequestException:
+                self._failed()
+                raise
+            else:
+                if response.status_code not in RETRYABLE_STATUSES:
+                    self.breaker.record_success()
+                    return response
+                self._failed()
+                if attempt >= retries:
+                    return response
+                response.close()
+
+            attempt += 1
+            self.retries += 1
+            time.sleep(self.backoff.delay(attempt))
+
+    def post(self, path: str, json: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        return self.request("POST", path, json=json, **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "circuit": self.breaker.stats()
+        }
+
+    def _failed(self):
+        self.failures += 1
+        self.breaker.record_failure()
+
+
+_transports: Dict[str, OllamaTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_transport(base_url: str = OLLAMA_HOST) -> OllamaTransport:
+    """Process-wide transport for an Ollama host, so all callers share one pool and breaker"""
+    key = base_url.rstrip("/")
+    with _transports_lock:
+        if key not in _transports:
+            _transports[key] = OllamaTransport(key)
+        return _transports[key]
@@ -3,11 +3,24 @@
 Complete RAG (Retrieval Augmented Generation) System
 Combines FAISS vector search with Ollama LLM generation
 """
+import asyncio
 import json
+import numpy as np
 import requests
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator, Tuple
 from datetime import datetime
+from config.ai_config import (
+    OLLAMA_HOST, RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL, RESPONSE_CACHE_THRESHOLD, RAG_CONTEXT_TOKEN_BUDGET,
+    LLM_MAX_CONCURRENT, LLM_QUEUE_SIZE, LLM_QUEUE_TIMEOUT, LLM_QUEUE_PER_USER
+)
 from vector_store_faiss import FAISSVectorStore
+from ollama_embeddings import OllamaEmbeddingClient
+from ollama_async import AsyncOllamaClient
+from ollama_transport import get_transport
+from embedding_retry import EmbeddingError
+from response_cache import SemanticResponseCache, GLOBAL_SCOPE
+from context_builder import ContextBuilder
+from admission import AdmissionController, Priority
 
 class RAGSystem:
     def __init__(self, vector_store: FAISSVectorStore = None, model_name: str = "phi3:mini"):
@@ -18,9 +31,36 @@ class RAGSystem:
             vector_store: FAISS vector store instance
             model_name: Ollama model to use for generation
         """
-        self.vector_store = vector_store or FAISSVectorStore()
+        if vector_store is not None:
+            self.embedding_client = vector_store.embedding_client
+        else:
+            self.embedding_client = OllamaEmbeddingClient()
+        self.vector_store = vector_store or FAISSVectorStore(embedding_client=self.embedding_client)
         self.model_name = model_name
-        self.ollama_url = "http://localhost:11434/api/generate"
+        self.ollama_url = f"{OLLAMA_HOST}/api/generate"
+        # Pooled, retrying transport shared with the embeddings client; its
+        # circuit breaker makes calls fail fast while Ollama is unavailable
+        self.transport = get_transport(OLLAMA_HOST)
+        self.context_builder = ContextBuilder(token_budget=RAG_CONTEXT_TOKEN_BUDGET)
+        # Non-blocking client for the async (a*) variants used by FastAPI handlers
+        self.async_client = AsyncOllamaClient()
+        
+        # Coaching replies reused for near-identical queries; a user's entries
+        # are dropped whenever their indexed data changes
+        self.response_cache = SemanticResponseCache(
+            max_entries=RESPONSE_CACHE_SIZE,
+            ttl=RESPONSE_CACHE_TTL,
+            similarity_threshold=RESPONSE_CACHE_THRESHOLD
+        )
+        self.vector_store.change_listeners.append(self._on_user_data_changed)
+        
+        # Bounds concurrent generations in the async paths; cache hits skip it
+        self.admission = AdmissionController(
+            max_concurrent=LLM_MAX_CONCURRENT,
+            max_queue=LLM_QUEUE_SIZE,
+            max_wait=LLM_QUEUE_TIMEOUT,
+            max_queued_per_user=LLM_QUEUE_PER_USER
+        )
     
     def generate_response(self, prompt: str, context: str = "", max_tokens: int = 500) -> str:
         """
@@ -32,8 +72,101 @@ class RAGSystem:
             max_tokens: Maximum tokens to generate
             
         Returns:
-            Generated response
+            Generated response (an error message if generation failed)
+        """
+        return self._generate(prompt, context, max_tokens)[0]
+    
+    def _generate(self, prompt: str, context: str = "", max_tokens: int = 500) -> Tuple[str, bool]:
+        """
+        Generate a response, reporting whether the model actually produced it
+        
+        Returns:
+            (response text, generated); on failure the text is a message for
+            the user and generated is False
+        """
+        try:
+            payload = self._generation_payload(prompt, context, max_tokens, stream=False)
+            
+            response = self.transport.post("/api/generate", json=payload)
+            
+            if response.status_code == 200:
+                return self._generated_text(response.json())
+            else:
+                return f"Error: Could not generate response (status {response.status_code})", False
+                
+        except Exception as e:
+            return f"Error generating response: {str(e)}", False
+    
+    def generate_response_stream(self, prompt: str, context: str = "", max_tokens: int = 500) -> Iterator[str]:
+        """
+        Generate a response using Ollama LLM, yielding tokens as they arrive
+        
+        Args:
+            prompt: User prompt
+            context: Retrieved context
+            max_tokens: Maximum tokens to generate
+            
+        Yields:
+            Response text fragments
+            
+        Raises:
+            requests.RequestException if Ollama fails
         """
+        payload = self._generation_payload(prompt, context, max_tokens, stream=True)
+        
+        # The read timeout applies between chunks, not to the whole reply
+        with self.transport.post("/api/generate", json=payload, stream=True) as response:
+            response.raise_for_status()
+            try:
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise requests.RequestException(chunk["error"])
+                    if chunk.get("response"):
+                        yield chunk["response"]
+                    if chunk.get("done"):
+                        break
+            except requests.ConnectionError:
+                # Stalled mid-reply (read timeouts surface as ConnectionError here)
+                self.transport.breaker.record_failure()
+                raise
+    
+    async def agenerate_response(self, prompt: str, context: str = "", max_tokens: int = 500) -> str:
+        """
+        Async variant of generate_response; does not block the event loop
+        """
+        return (await self._agenerate(prompt, context, max_tokens))[0]
+    
+    async def _agenerate(self, prompt: str, context: str = "", max_tokens: int = 500) -> Tuple[str, bool]:
+        """Async variant of _generate"""
+        try:
+            payload = self._generation_payload(prompt, context, max_tokens, stream=False)
+            return self._generated_text(await self.async_client.generate(payload))
+        except Exception as e:
+            return f"Error generating response: {str(e)}", False
+    
+    @staticmethod
+    def _generated_text(result: Dict[str, Any]) -> Tuple[str, bool]:
+        if result.get('response'):
+            return result['response'], True
+        return 'Sorry, I could not generate a response.', False
+    
+    async def agenerate_response_stream(self, prompt: str, context: str = "",
+                                        max_tokens: int = 500) -> AsyncIterator[str]:
+        """
+        Async variant of generate_response_stream
+        
+        Raises:
+            httpx.HTTPError if Ollama fails
+        """
+        payload = self._generation_payload(prompt, context, max_tokens, stream=True)
+        async for token in self.async_client.generate_stream(payload):
+            yield token
+    
+    def _generation_payload(self, prompt: str, context: str, max_tokens: int, stream: bool) -> Dict[str, Any]:
+        """Build the Ollama /api/generate request body"""
         # Construct full prompt with context
         full_prompt = f"""Context: {context}
 
@@ -41,30 +174,19 @@ User Query: {prompt}
 
 Please provide a helpful, personalized response based on the context above. Be supportive and actionable."""
 
-        try:
-            payload = {
-                "model": self.model_name,
-                "prompt": full_prompt,
-                "stream": False,
-                "options": {
-                    "num_predict": max_tokens,
-                    "temperature": 0.7,
-                    "top_p": 0.9
-                }
+        return {
+            "model": self.model_name,
+            "prompt": full_prompt,
+            "stream": stream,
+            "options": {
+                "num_predict": max_tokens,
+                "temperature": 0.7,
+                "top_p": 0.9
             }
-            
-            response = requests.post(self.ollama_url, json=payload, timeout=60)
-            
-            if response.status_code == 200:
-                result = response.json()
-                return result.get('response', 'Sorry, I could not generate a response.')
-            else:
-                return f"Error: Could not generate response (status {response.status_code})"
-                
-        except Exception as e:
-            return f"Error generating response: {str(e)}"
+        }
     
-    def retrieve_and_generate(self, user_id: str, query: str, k: int = 3) -> Dict[str, Any]:
+    def retrieve_and_generate(self, user_id: str, query: str, k: int = 3,
+                              query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         Main RAG pipeline: retrieve relevant context and generate response
         
@@ -72,34 +194,74 @@ Please provide a helpful, personalized response based on the context above. Be s
             user_id: User identifier
             query: User query
             k: Number of documents to retrieve
+            query_embedding: Precomputed embedding of query (embedded if omitted)
             
         Returns:
             Complete RAG response with context and generation
         """
         # Step 1: Retrieve relevant context
-        context_data = self.vector_store.get_user_context(user_id, query)
+        context_data = self.vector_store.get_user_context(user_id, query, query_embedding=query_embedding)
         
         # Step 2: Format context for LLM
         context_text = self._format_context(context_data, k)
         
         # Step 3: Generate response
-        response = self.generate_response(query, context_text)
+        response, generated = self._generate(query, context_text)
         
         # Step 4: Return complete result
-        return {
-            "user_id": user_id,
-            "query": query,
-            "response": response,
-            "context_used": context_data,
-            "context_text": context_text,
-            "timestamp": datetime.now().isoformat(),
-            "model_used": self.model_name
-        }
+        return self._build_response(user_id, query, context_data, context_text, response, generated)
+    
+    async def aretrieve_and_generate(self, user_id: str, query: str, k: int = 3,
+                                     query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """
+        Async variant of retrieve_and_generate
+        
+        The query is embedded and the response generated over the async
+        client; the in-memory FAISS lookup and context formatting run in a
+        worker thread.
+        """
+        # Steps 1 and 2: Retrieve relevant context and format it for LLM
+        context_data, context_text = await self._aretrieve_context(user_id, query, k, query_embedding)
+        
+        # Step 3: Generate response
+        response, generated = await self._agenerate(query, context_text)
+        
+        # Step 4: Return complete result
+        return self._build_response(user_id, query, context_data, context_text, response, generated)
+    
+    async def _aretrieve_context(self, user_id: str, query: str, k: int,
+                                 query_embedding: Optional[np.ndarray] = None) -> Tuple[Dict[str, Any], str]:
+        """
+        Embed the query without blocking, then search the vector store by
+        vector and format the context in a worker thread
+        
+        Both steps take the vector store's index lock, which can block behind
+        a writer, so neither may run on the event loop.
+        
+        Returns:
+            (context_data, context_text)
+        """
+        if query_embedding is None:
+            try:
+                query_embedding = await self.async_client.embed(self.embedding_client.model, query)
+            except EmbeddingError as e:
+                print(f"Error embedding context query: {e}")
+                return {"query": query, "user_id": user_id, "relevant_data": {}}, self._format_context({}, 0)
+        
+        return await asyncio.to_thread(self._retrieve_context, user_id, query, k, query_embedding)
+    
+    def _retrieve_context(self, user_id: str, query: str, k: int,
+                          query_embedding: np.ndarray) -> Tuple[Dict[str, Any], str]:
+        context_data = self.vector_store.get_user_context(user_id, query, query_embedding=query_embedding)
+        return context_data, self._format_context(context_data, k)
     
     def _format_context(self, context_data: Dict[str, Any], k: int) -> str:
         """
         Format retrieved context for LLM consumption
         
+        Items from all categories are ranked together, near-duplicates are
+        dropped and the result is kept within RAG_CONTEXT_TOKEN_BUDGET.
+        
         Args:
             context_data: Retrieved context from vector store
             k: Number of items per category
@@ -107,18 +269,13 @@ Please provide a helpful, personalized response based on the context above. Be s
         Returns:
             Formatted context string
         """
-        context_parts = []
-        
-        for data_type, items in context_data.get("relevant_data", {}).items():
-            if items:
-                context_parts.append(f"\n{data_type.upper()} HISTORY:")
-                for i, item in enumerate(items[:k]):
-                    score = item.get('score', 0)
-                    text = item.get('text', item.get('content', ''))
-                    timestamp = item.get('timestamp', '')
-                    context_parts.append(f"  {i+1}. [{score:.3f}] {text} (from {timestamp[:10]})")
-        
-        return "\n".join(context_parts) if context_parts else "No relevant context found."
+        doc_ids = [
+            item["id"]
+            for items in context_data.get("relevant_data", {}).values()
+            for item in items[:k] if "id" in item
+        ]
+        vectors = self.vector_store.get_vectors(doc_ids) if doc_ids else {}
+        return self.context_builder.build(context_data, k, vectors)
     
     def add_user_interaction(self, user_id: str, interaction_type: str, content: str, metadata: Dict[str, Any] = None):
         """
@@ -136,9 +293,45 @@ Please provide a helpful, personalized response based on the context above. Be s
             "timestamp": datetime.now().isoformat()
         })
         
+        # Also invalidated by the vector store once indexed; this covers
+        # interactions left pending for re-embedding
+        self.response_cache.invalidate(user_id)
         return self.vector_store.add_user_data(user_id, interaction_type, content, extra_metadata)
     
-    def get_coaching_response(self, user_id: str, message: str, coaching_type: str = "general") -> Dict[str, Any]:
+    def add_user_interactions(self, interactions: List[Dict[str, Any]]) -> List[int]:
+        """
+        Add many user interactions in one batched ingest
+        
+        Args:
+            interactions: Dicts with user_id, interaction_type, content and optional metadata
+            
+        Returns:
+            Document IDs in input order (None for interactions left pending)
+        """
+        items = []
+        for interaction in interactions:
+            extra_metadata = dict(interaction.get("metadata") or {})
+            extra_metadata.update({
+                "interaction_type": interaction["interaction_type"],
+                "timestamp": datetime.now().isoformat()
+            })
+            items.append({
+                "user_id": interaction["user_id"],
+                "data_type": interaction["interaction_type"],
+                "content": interaction["content"],
+                "extra_metadata": extra_metadata
+            })
+        
+        self._on_user_data_changed({item["user_id"] for item in items})
+        return self.vector_store.add_user_data_bulk(items)
+    
+    def _on_user_data_changed(self, user_ids):
+        """Drop cached replies built from data that just changed"""
+        for user_id in user_ids:
+            self.response_cache.invalidate(user_id)
+    
+    def get_coaching_response(self, user_id: str, message: str, coaching_type: str = "general",
+                              scope: str = "user") -> Dict[str, Any]:
         """
         Get AI coaching response with personalized context
         
@@ -146,22 +339,192 @@ Please provide a helpful, personalized response based on the context above. Be s
             user_id: User identifier
             message: User message
             coaching_type: Type of coaching (motivation, planning, reflection)
+            scope: "user" caches replies per user; "global" skips retrieval and
+                   shares replies across all users (e.g. previews)
             
         Returns:
-            Coaching response with context
+            Coaching response with context ("cached": True when served from cache)
         """
         # Enhance query with coaching context
         enhanced_query = f"[{coaching_type.upper()} COACHING] {message}"
+        cache_scope = GLOBAL_SCOPE if scope == "global" else user_id
+        
+        try:
+            query_embedding = self.embedding_client.embed(enhanced_query)
+        except EmbeddingError as e:
+            print(f"Error embedding coaching query, skipping response cache: {e}")
+            query_embedding = None
+        
+        # Read before lookup so a reply generated across an invalidation isn't stored
+        cache_generation = self.response_cache.generation(cache_scope)
+        if query_embedding is not None:
+            cached = self.response_cache.lookup(cache_scope, coaching_type, query_embedding)
+            if cached is not None:
+                return self._cached_reply(cached, user_id)
         
         # Get RAG response
-        rag_response = self.retrieve_and_generate(user_id, enhanced_query)
+        if scope == "global":
+            context_text = self._format_context({}, 0)
+            rag_response = self._build_response(user_id, enhanced_query, {"relevant_data": {}}, context_text,
+                                                *self._generate(enhanced_query, context_text))
+        else:
+            rag_response = self.retrieve_and_generate(user_id, enhanced_query, query_embedding=query_embedding)
         
         # Add coaching-specific enhancements
         rag_response["coaching_type"] = coaching_type
         rag_response["personalized"] = len(rag_response["context_used"]["relevant_data"]) > 0
+        rag_response["cached"] = False
+        
+        if query_embedding is not None and rag_response["generated"]:
+            self.response_cache.store(cache_scope, coaching_type, query_embedding, rag_response, cache_generation)
         
         return rag_response
     
+    async def aget_coaching_response(self, user_id: str, message: str, coaching_type: str = "general",
+                                     scope: str = "user",
+                                     priority: Priority = Priority.INTERACTIVE) -> Dict[str, Any]:
+        """
+        Async variant of get_coaching_response for FastAPI handlers
+        
+        Cache misses wait for a generation slot in the given priority class.
+        
+        Raises:
+            AdmissionRejected when the request is shed under load
+        """
+        # Enhance query with coaching context
+        enhanced_query = f"[{coaching_type.upper()} COACHING] {message}"
+        cache_scope = GLOBAL_SCOPE if scope == "global" else user_id
+        
+        try:
+            query_embedding = await self.async_client.embed(self.embedding_client.model, enhanced_query)
+        except EmbeddingError as e:
+            print(f"Error embedding coaching query, skipping response cache: {e}")
+            query_embedding = None
+        
+        # Read before lookup so a reply generated across an invalidation isn't stored
+        cache_generation = self.response_cache.generation(cache_scope)
+        if query_embedding is not None:
+            cached = self.response_cache.lookup(cache_scope, coaching_type, query_embedding)
+            if cached is not None:
+                return self._cached_reply(cached, user_id)
+        
+        # Get RAG response
+        async with self.admission.slot(user_id, priority):
+            if scope == "global":
+                context_text = self._format_context({}, 0)
+                rag_response = self._build_response(user_id, enhanced_query, {"relevant_data": {}}, context_text,
+                                                    *await self._agenerate(enhanced_query, context_text))
+            else:
+                rag_response = await self.aretrieve_and_generate(user_id, enhanced_query,
+                                                                 query_embedding=query_embedding)
+        
+        # Add coaching-specific enhancements
+        rag_response["coaching_type"] = coaching_type
+        rag_response["personalized"] = len(rag_response["context_used"]["relevant_data"]) > 0
+        rag_response["cached"] = False
+        
+        if query_embedding is not None and rag_response["generated"]:
+            self.response_cache.store(cache_scope, coaching_type, query_embedding, rag_response, cache_generation)
+        
+        return rag_response
+    
+    def _build_response(self, user_id: str, query: str, context_data: Dict[str, Any], context_text: str,
+                        response: str, generated: bool = True) -> Dict[str, Any]:
+        """Assemble the RAG result returned to callers"""
+        return {
+            "user_id": user_id,
+            "query": query,
+            "response": response,
+            # False when response is a failure message rather than model output
+            "generated": generated,
+            "context_used": context_data,
+            "context_text": context_text,
+            "timestamp": datetime.now().isoformat(),
+            "model_used": self.model_name
+        }
+    
+    def _cached_reply(self, cached: Dict[str, Any], user_id: str) -> Dict[str, Any]:
+        """Adapt a cached reply to the current request"""
+        cached["user_id"] = user_id
+        cached["cached"] = True
+        cached["timestamp"] = datetime.now().isoformat()
+        return cached
+    
+    def get_coaching_response_stream(self, user_id: str, message: str, coaching_type: str = "general",
+                                     k: int = 3) -> Iterator[Dict[str, Any]]:
+        """
+        Streaming variant of get_coaching_response
+        
+        Retrieval runs first, then tokens are yielded as Ollama emits them.
+        
+        Yields:
+            {"type": "context", ...} once, {"type": "token", "text": ...} per
+            fragment, and {"type": "done", "response": <full text>, ...} at the end
+        """
+        enhanced_query = f"[{coaching_type.upper()} COACHING] {message}"
+        
+        context_data = self.vector_store.get_user_context(user_id, enhanced_query)
+        context_text = self._format_context(context_data, k)
+        
+        yield {
+            "type": "context",
+            "user_id": user_id,
+            "coaching_type": coaching_type,
+            "context_used": list(context_data["relevant_data"].keys()),
+            "personalized": len(context_data["relevant_data"]) > 0
+        }
+        
+        parts = []
+        for token in self.generate_response_stream(enhanced_query, context_text):
+            parts.append(token)
+            yield {"type": "token", "text": token}
+        
+        yield {
+            "type": "done",
+            "response": "".join(parts),
+            "coaching_type": coaching_type,
+            "timestamp": datetime.now().isoformat(),
+            "model_used": self.model_name
+        }
+    
+    async def aget_coaching_response_stream(self, user_id: str, message: str, coaching_type: str = "general",
+                                            k: int = 3, priority: Priority = Priority.INTERACTIVE
+                                            ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Async variant of get_coaching_response_stream
+        
+        The generation slot is taken before the "context" event and held
+        until the last token.
+        
+        Raises:
+            AdmissionRejected when the request is shed under load
+        """
+        enhanced_query = f"[{coaching_type.upper()} COACHING] {message}"
+        
+        context_data, context_text = await self._aretrieve_context(user_id, enhanced_query, k)
+        
+        parts = []
+        async with self.admission.slot(user_id, priority):
+            yield {
+                "type": "context",
+                "user_id": user_id,
+                "coaching_type": coaching_type,
+                "context_used": list(context_data["relevant_data"].keys()),
+                "personalized": len(context_data["relevant_data"]) > 0
+            }
+            
+            async for token in self.agenerate_response_stream(enhanced_query, context_text):
+                parts.append(token)
+                yield {"type": "token", "text": token}
+        
+        yield {
+            "type": "done",
+            "response": "".join(parts),
+            "coaching_type": coaching_type,
+            "timestamp": datetime.now().isoformat(),
+            "model_used": self.model_name
+        }
+    
     def analyze_user_patterns(self, user_id: str) -> Dict[str, Any]:
         """
         Analyze user patterns using vector search
@@ -203,6 +566,9 @@ Please provide a helpful, personalized response based on the context above. Be s
                 "ollama_url": self.ollama_url,
                 "status": "operational"
             },
+            "response_cache": self.response_cache.stats(),
+            "ollama_transport": self.transport.stats(),
+            "admission": self.admission.stats(),
             "vector_store": vector_stats,
             "timestamp": datetime.now().isoformat()
         }
@@ -5,16 +5,20 @@ FastAPI server that connects the RAG system to the React Native app
 """
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import uvicorn
 import json
 from datetime import datetime, timedelta
 import random
-import requests
+import asyncio
+import uuid
 
 from rag_system import RAGSystem
 from vector_store_faiss import FAISSVectorStore
+from health import HealthMonitor
+from admission import Priority
 
 # Initialize FastAPI app
 app = FastAPI(title="Momentum AI RAG Service", version="1.0.0")
@@ -36,6 +40,54 @@ except Exception as e:
     print(f"❌ Error initializing RAG system: {e}")
     rag_system = None
 
+# Health probes: cheap checks refreshed in the background, never an LLM generation
+async def probe_rag() -> Dict[str, Any]:
+    if rag_system is None:
+        raise RuntimeError("not initialized")
+    return {"status": "operational", "model": rag_system.model_name}
+
+async def probe_ollama() -> Dict[str, Any]:
+    if rag_system is None:
+        raise RuntimeError("not initialized")
+    version = await rag_system.async_client.version()
+    circuit = rag_system.async_client.breaker.state
+    # Reachable but failing real requests (e.g. generation timing out) is not ready
+    status = "operational" if circuit != "open" else "error: circuit open"
+    return {"status": status, "version": version, "circuit": circuit}
+
+async def probe_vector_store() -> Dict[str, Any]:
+    if rag_system is None or rag_system.vector_store is None:
+        raise RuntimeError("not initialized")
+    stats = await asyncio.to_thread(rag_system.vector_store.get_stats)
+    return {
+        "status": "operational",
+        "documents": stats.get("total_documents", 0),
+        "pending_embeddings": stats.get("pending_embeddings", 0)
+    }
+
+async def deep_check() -> Dict[str, Any]:
+    """End-to-end: one embedding and a single-token generation"""
+    if rag_system is None:
+        raise RuntimeError("not initialized")
+    await rag_system.async_client.embed(rag_system.embedding_client.model, "health check")
+    payload = rag_system._generation_payload("ping", "", max_tokens=1, stream=False)
+    await rag_system.async_client.generate(payload)
+    return {"status": "operational"}
+
+def summarize_probe(name: str, result: Dict[str, Any]) -> Any:
+    """Probe result in the /health "services" format: a status string (vector store: status + documents)"""
+    status = result["status"]
+    if status == "error: not initialized":
+        status = "not initialized"
+    if name == "vector_store" and status == "operational":
+        return {"status": status, "documents": result.get("documents", 0)}
+    return status
+
+health_monitor = HealthMonitor(
+    {"rag": probe_rag, "ollama": probe_ollama, "vector_store": probe_vector_store},
+    deep_check=deep_check
+)
+
 # Request/Response models
 class ChatMessage(BaseModel):
     message: str
@@ -58,6 +110,9 @@ class UserInteraction(BaseModel):
     content: str
     metadata: Optional[Dict[str, Any]] = None
 
+class BulkUserInteractions(BaseModel):
+    interactions: List[UserInteraction]
+
 class PatternAnalysisResponse(BaseModel):
     userId: str
     patterns: Dict[str, Any]
@@ -111,56 +166,41 @@ async def root():
     }
 
 @app.get("/health")
-async def health_check():
-    """Health check endpoint"""
+async def health_check(deep: bool = False):
+    """
+    Health summary from cached backend probes
+    Pass ?deep=true for an end-to-end embedding + generation check (rate limited)
+    """
+    readiness = await health_monitor.readiness()
     health_status = {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "services": {}
+        "status": "healthy" if readiness["ready"] else "degraded",
+        "timestamp": readiness["timestamp"],
+        "services": {name: summarize_probe(name, result) for name, result in readiness["services"].items()},
+        # Full probe results (latency, versions, circuit state)
+        "probes": {
+            "checked_seconds_ago": readiness["checked_seconds_ago"],
+            "results": readiness["services"]
+        }
     }
     
-    # Check RAG system
-    if rag_system:
-        try:
-            # Test a simple query
-            test_response = rag_system.generate_response("test")
-            health_status["services"]["rag"] = "operational"
-        except Exception as e:
-            health_status["services"]["rag"] = f"error: {str(e)}"
+    if deep:
+        health_status["deep"] = await health_monitor.deep()
+        if health_status["deep"]["status"] != "operational":
             health_status["status"] = "degraded"
-    else:
-        health_status["services"]["rag"] = "not initialized"
-        health_status["status"] = "degraded"
-    
-    # Check Ollama
-    try:
-        response = requests.get("http://localhost:11434/api/version")
-        if response.status_code == 200:
-            health_status["services"]["ollama"] = "operational"
-        else:
-            health_status["services"]["ollama"] = "error: non-200 status code"
-            health_status["status"] = "degraded"
-    except Exception as e:
-        health_status["services"]["ollama"] = f"error: {str(e)}"
-        health_status["status"] = "degraded"
-    
-    # Check vector store
-    try:
-        if rag_system and rag_system.vector_store:
-            stats = rag_system.vector_store.get_stats()
-            health_status["services"]["vector_store"] = {
-                "status": "operational",
-                "documents": stats.get("total_documents", 0)
-            }
-        else:
-            health_status["services"]["vector_store"] = "not initialized"
-            health_status["status"] = "degraded"
-    except Exception as e:
-        health_status["services"]["vector_store"] = f"error: {str(e)}"
-        health_status["status"] = "degraded"
     
     return health_status
 
+@app.get("/health/live")
+async def liveness_check():
+    """Liveness probe: no backend calls"""
+    return health_monitor.liveness()
+
+@app.get("/health/ready")
+async def readiness_check():
+    """Readiness probe: 503 until every backend probe is operational"""
+    readiness = await health_monitor.readiness()
+    return JSONResponse(readiness, status_code=200 if readiness["ready"] else 503)
+
 @app.post("/chat", response_model=ChatResponse)
 async def get_contextual_reply(request: ChatMessage):
     """
@@ -168,8 +208,8 @@ async def get_contextual_reply(request: ChatMessage):
     This is the function your React Native app will call
     """
     try:
-        # Get RAG response with user context
-        rag_response = rag_system.get_coaching_response(
+        # Get RAG response with user context (non-blocking)
+        rag_response = await rag_system.aget_coaching_response(
             request.userId, 
             request.message, 
             request.coachingType
@@ -190,7 +230,7 @@ async def get_contextual_reply(request: ChatMessage):
         )
         
     except Exception as e:
-        # Fallback response if RAG fails
+        # Fallback response if RAG fails or the request was shed under load
         fallback_response = get_fallback_response(request.message, request.coachingType)
         return ChatResponse(
             response=fallback_response["response"],
@@ -202,6 +242,58 @@ async def get_contextual_reply(request: ChatMessage):
             timestamp=datetime.now().isoformat()
         )
 
+@app.post("/chat/stream")
+async def stream_contextual_reply(request: ChatMessage):
+    """
+    Streaming chat endpoint (Server-Sent Events)
+    Sends a "context" event, then "token" events as the model generates,
+    then a "done" event with the full response and recommendations
+    """
+    def sse(event: Dict[str, Any]) -> str:
+        return f"data: {json.dumps(event)}\n\n"
+    
+    async def events():
+        response_text = None
+        streamed_tokens = False
+        try:
+            if rag_system is None:
+                raise RuntimeError("RAG system not initialized")
+            async for event in rag_system.aget_coaching_response_stream(
+                request.userId,
+                request.message,
+                request.coachingType
+            ):
+                if event["type"] == "token":
+                    streamed_tokens = True
+                elif event["type"] == "done":
+                    response_text = event["response"]
+                    event["recommendations"] = extract_recommendations(response_text)
+                    event["follow_up_actions"] = extract_follow_up_actions(request.message, request.coachingType)
+                yield sse(event)
+        except Exception as e:
+            if streamed_tokens:
+                # Part of the reply is already on the client; just report the failure
+                yield sse({"type": "error", "error": str(e)})
+                return
+            # Nothing sent yet: fall back like /chat does
+            fallback_response = get_fallback_response(request.message, request.coachingType)
+            yield sse({"type": "token", "text": fallback_response["response"]})
+            yield sse({
+                "type": "done",
+                "response": fallback_response["response"],
+                "coaching_type": request.coachingType,
+                "recommendations": fallback_response["recommendations"],
+                "follow_up_actions": fallback_response["follow_up_actions"],
+                "fallback": True,
+                "timestamp": datetime.now().isoformat()
+            })
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/user-interaction")
 async def add_user_interaction(request: UserInteraction):
     """
@@ -216,15 +308,46 @@ async def add_user_interaction(request: UserInteraction):
             request.metadata
         )
         
+        # doc_id is None when embedding failed; the interaction is queued for retry
         return {
             "success": True,
             "doc_id": doc_id,
+            "pending": doc_id is None,
             "message": f"Added {request.interactionType} for user {request.userId}"
         }
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/user-interactions/bulk")
+async def add_user_interactions_bulk(request: BulkUserInteractions):
+    """
+    Add many user interactions in one batched ingest
+    Use this for mobile backfills instead of looping over /user-interaction
+    """
+    try:
+        # Embedding and index/WAL writes block; keep them off the event loop
+        doc_ids = await asyncio.to_thread(rag_system.add_user_interactions, [
+            {
+                "user_id": interaction.userId,
+                "interaction_type": interaction.interactionType,
+                "content": interaction.content,
+                "metadata": interaction.metadata
+            }
+            for interaction in request.interactions
+        ])
+        
+        return {
+            "success": True,
+            "doc_ids": doc_ids,
+            "count": len(doc_ids),
+            "pending": sum(1 for doc_id in doc_ids if doc_id is None),
+            "message": f"Added {len(doc_ids)} interactions"
+        }
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/user-patterns/{user_id}", response_model=PatternAnalysisResponse)
 async def analyze_user_patterns(user_id: str):
     """
@@ -298,8 +421,17 @@ async def get_coach_preview(request: dict):
         
         if rag_system:
             try:
-                response = rag_system.chat(prompt, user_id="preview_user")
-                return {"response": response["response"]}
+                # Previews aren't personalized, so one cached reply serves every user;
+                # admission is still per caller so one client can't fill the preview queue
+                response = await rag_system.aget_coaching_response(
+                    request.get("userId") or f"preview-{uuid.uuid4().hex}",
+                    prompt,
+                    request.get("coachingType", "motivation"),
+                    scope="global",
+                    priority=Priority.PREVIEW
+                )
+                if response["generated"]:
+                    return {"response": response["response"], "cached": response["cached"]}
             except Exception as e:
                 print(f"RAG system error: {e}")
         
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Semantic response cache
+Reuses coaching replies for near-identical queries, matched by embedding
+similarity within a (scope, coaching_type) bucket
+"""
+import copy
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+# Scope for replies that don't depend on any one user's data
+GLOBAL_SCOPE = "__global__"
+
+
+class SemanticResponseCache:
+    def __init__(self, max_entries: int = 1000, ttl: float = 600.0, similarity_threshold: float = 0.95,
+                 max_bucket_size: int = 64):
+        """
+        Initialize the cache
+
+        Args:
+            max_entries: Replies kept before the least recently used is evicted
+            ttl: Seconds a reply stays valid
+            similarity_threshold: Minimum cosine similarity between query embeddings for a hit
+            max_bucket_size: Replies kept per (scope, coaching_type), bounding lookup cost
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.max_bucket_size = max_bucket_size
+
+        # entry id -> (bucket key, normalized embedding, response, created_at)
+        self._entries: "OrderedDict[int, tuple]" = OrderedDict()
+        # bucket key -> entry ids, oldest first
+        self._buckets: Dict[Tuple[str, str], list] = {}
+        self._next_id = 0
+        # scope -> generation at its last invalidation, so replies generated before an
+        # invalidation aren't stored. Generations come from one increasing counter;
+        # the least recently invalidated scopes are dropped beyond max_entries and
+        # then read as the highest generation dropped, which can only reject a
+        # store, never accept a stale one.
+        self._generations: "OrderedDict[str, int]" = OrderedDict()
+        self._generation_counter = 0
+        self._evicted_generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def lookup(self, scope: str, coaching_type: str, query_embedding: np.ndarray) -> Optional[Dict[str, Any]]:
+        """
+        Best cached reply for a similar query in the same bucket
+
+        Returns:
+            A copy of the cached response, or None on a miss
+        """
+        query = self._normalize(query_embedding)
+        now = time.monotonic()
+        with self._lock:
+            entry_ids = self._buckets.get((scope, coaching_type), [])
+            for entry_id in [i for i in entry_ids if now - self._entries[i][3] >= self.ttl]:
+                self._remove(entry_id)
+            entry_ids = self._buckets.get((scope, coaching_type), [])
+
+            if entry_ids:
+                embeddings = np.vstack([self._entries[i][1] for i in entry_ids])
+                similarities = embeddings @ query
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    entry_id = entry_ids[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    response = copy.deepcopy(self._entries[entry_id][2])
+                    response["cache_similarity"] = float(similarities[best])
+                    return response
+
+            self.misses += 1
+            return None
+
+    def generation(self, scope: str) -> int:
+        """Current generation of a scope; read it before generating and pass it to store()"""
+        with self._lock:
+            return self._generation(scope)
+
+    def store(self, scope: str, coaching_type: str, query_embedding: np.ndarray, response: Dict[str, Any],
+              generation: Optional[int] = None):
+        """
+        Cache a reply for a query embedding
+
+        Args:
+            generation: generation(scope) read before the reply was generated;
+                        if the scope was invalidated since, the reply is stale
+                        and is not stored
+        """
+        key = (scope, coaching_type)
+        with self._lock:
+            if generation is not None and generation != self._generation(scope):
+                return
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (key, self._normalize(query_embedding), copy.deepcopy(response), time.monotonic())
+            self._buckets.setdefault(key, []).append(entry_id)
+
+            bucket = self._buckets[key]
+            while len(bucket) > self.max_bucket_size:
+                self._remove(bucket[0])
+                self.evictions += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, scope: str):
+        """Drop every cached reply for a scope (e.g. after the user's data changed)"""
+        with self._lock:
+            self._generation_counter += 1
+            self._generations.pop(scope, None)
+            self._generations[scope] = self._generation_counter
+            while len(self._generations) > self.max_entries:
+                _, evicted = self._generations.popitem(last=False)
+                self._evicted_generation = max(self._evicted_generation, evicted)
+            for key in [key for key in self._buckets if key[0] == scope]:
+                for entry_id in list(self._buckets[key]):
+                    self._remove(entry_id)
+                    self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "similarity_threshold": self.similarity_threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _generation(self, scope: str) -> int:
+        # Caller holds self._lock
+        return self._generations.get(scope, self._evicted_generation)
+
+    def _remove(self, entry_id: int):
+        # Caller holds self._lock
+        key = self._entries.pop(entry_id)[0]
+        bucket = self._buckets[key]
+        bucket.remove(entry_id)
+        if not bucket:
+            del self._buckets[key]
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -2,25 +2,46 @@
 Service for interacting with Ollama models
 """
 import json
-import requests
 from typing import Dict, Any, List, Optional
-from ai_service.config.ai_config import AIConfig, ModelProvider
+from ai_service.config.ai_config import AIConfig, ModelProvider, OLLAMA_HOST
+from ai_service.ollama_transport import OllamaTransport, get_transport
+from ai_service.services.session_store import (
+    ConversationSession, ConversationSessionStore, fingerprint_messages
+)
 
 class OllamaService:
-    def __init__(self, config: AIConfig):
+    def __init__(self, config: AIConfig, sessions: Optional[ConversationSessionStore] = None,
+                 transport: Optional[OllamaTransport] = None):
         self.config = config
+        # Pooled connections, timeouts, retries and circuit breaker shared with other Ollama callers
+        self.transport = transport or get_transport(OLLAMA_HOST)
+        # Ollama KV context per conversation, so chat() only sends the new turn
+        self.sessions = sessions or ConversationSessionStore()
         
     def generate(
         self,
         prompt: str,
         system: Optional[str] = None,
-        context: Optional[List[str]] = None,
+        context: Optional[List[int]] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None
     ) -> str:
         """
         Generate text using Ollama model
         """
+        return self._generate(prompt, system, context, temperature, max_tokens)["response"]
+    
+    def _generate(
+        self,
+        prompt: str,
+        system: Optional[str] = None,
+        context: Optional[List[int]] = None,
+        temperature: Optional[float] = None,
+        max_tokens: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Call /api/generate and return the full response body (including "context")
+        """
         payload = {
             "model": self.config.model_config["model_name"],
             "prompt": prompt,
@@ -36,23 +57,63 @@ class OllamaService:
         if max_tokens is not None:
             payload["max_tokens"] = max_tokens
             
-        response = requests.post(
-            self.config.ollama_url,
-            json=payload
-        )
+        response = self.transport.post("/api/generate", json=payload)
         response.raise_for_status()
         
-        return response.json()["response"]
+        return response.json()
     
     def chat(
         self,
         messages: List[Dict[str, str]],
         temperature: Optional[float] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        conversation_id: Optional[str] = None
     ) -> str:
         """
         Chat with Ollama model using message format
+        
+        With a conversation_id, the context tokens Ollama returns are kept and
+        the next call only sends the messages added since, so each turn costs
+        a constant prefill. If the history no longer matches the stored
+        session (edited, truncated, model changed), the full history is sent.
         """
+        model = self.config.model_config["model_name"]
+        session = self.sessions.get(conversation_id) if conversation_id else None
+        
+        context = None
+        new_messages = messages
+        if (session is not None and session.model == model and session.turns <= len(messages)
+                and session.fingerprint == fingerprint_messages(messages[:session.turns])):
+            context = session.context
+            new_messages = messages[session.turns:]
+        
+        result = self._generate(
+            prompt=self._messages_to_prompt(new_messages),
+            context=context,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        reply = result["response"]
+        
+        if conversation_id and result.get("context"):
+            # The returned context already includes this reply, which the
+            # caller is expected to append to the history as-is
+            history = messages + [{"role": "assistant", "content": reply}]
+            self.sessions.put(conversation_id, ConversationSession(
+                model=model,
+                context=result["context"],
+                turns=len(history),
+                fingerprint=fingerprint_messages(history)
+            ))
+        
+        return reply
+    
+    def end_conversation(self, conversation_id: str):
+        """Forget a conversation's stored context"""
+        self.sessions.drop(conversation_id)
+    
+    @staticmethod
+    def _messages_to_prompt(messages: List[Dict[str, str]]) -> str:
         # Convert messages to prompt format
         prompt = ""
         for msg in messages:
@@ -65,9 +126,5 @@ class OllamaService:
                 prompt += f"User: {content}\n"
             elif role == "assistant":
                 prompt += f"Assistant: {content}\n"
-                
-        return self.generate(
-            prompt=prompt,
-            temperature=temperature,
-            max_tokens=max_tokens
-        ) 
\ No newline at end of file
+        
+        return prompt 
\ No newline at end of file
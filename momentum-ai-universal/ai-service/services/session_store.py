@@ -0,0 +1,75 @@
+"""
+Per-conversation store for Ollama KV context
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+
+
+def fingerprint_messages(messages: List[Dict[str, str]]) -> str:
+    """Stable hash of a message history, used to check a session still matches it"""
+    canonical = json.dumps([[msg["role"], msg["content"]] for msg in messages], ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+@dataclass
+class ConversationSession:
+    model: str
+    # Token context returned by Ollama; encodes every turn so far
+    context: List[int]
+    # Number of messages (including the last assistant reply) the context covers
+    turns: int
+    fingerprint: str
+    updated_at: float = field(default_factory=time.monotonic)
+
+
+class ConversationSessionStore:
+    def __init__(self, max_sessions: int = 1000, ttl: float = 1800.0):
+        """
+        Args:
+            max_sessions: Conversations kept before the least recently used is evicted
+            ttl: Seconds of inactivity before a conversation's context is dropped
+        """
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, conversation_id: str) -> Optional[ConversationSession]:
+        with self._lock:
+            session = self._sessions.get(conversation_id)
+            if session is not None and time.monotonic() - session.updated_at >= self.ttl:
+                del self._sessions[conversation_id]
+                session = None
+            if session is None:
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(conversation_id)
+            self.hits += 1
+            return session
+
+    def put(self, conversation_id: str, session: ConversationSession):
+        with self._lock:
+            self._sessions[conversation_id] = session
+            self._sessions.move_to_end(conversation_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def drop(self, conversation_id: str):
+        with self._lock:
+            self._sessions.pop(conversation_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
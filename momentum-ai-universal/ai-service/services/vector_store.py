@@ -7,19 +7,96 @@ import faiss
 from typing import List, Dict, Any, Optional
 from ai_service.config.ai_config import AIConfig, VectorStore
 
+# index_factory descriptions for the supported index types
+INDEX_FACTORY_STRINGS = {
+    "IndexFlatL2": "Flat",
+    "IndexFlatIP": "Flat",
+    "IndexIVFFlat": "IVF{nlist},Flat",
+    "IndexIVFPQ": "IVF{nlist},PQ{pq_m}x{pq_nbits}",
+    "IndexHNSWFlat": "HNSW{hnsw_m}",
+    "IndexSQ8": "SQ8",
+    "IndexSQfp16": "SQfp16"
+}
+
 class VectorStoreService:
     def __init__(self, config: AIConfig):
         self.config = config
         self.dimension = config.vector_store_config["dimension"]
+        self.metric = self._metric()
         self.index = self._create_index()
+        self.index_is_mapped = False
+        self.index_path: Optional[str] = None
         self.documents: List[Dict[str, Any]] = []
         
+    def _metric(self) -> str:
+        """Resolve the distance metric ("l2", "ip" or "cosine")"""
+        vs_config = self.config.vector_store_config
+        metric = vs_config.get("metric", "l2")
+        if vs_config["index_type"] == "IndexFlatIP" and metric == "l2":
+            metric = "ip"  # the type name implies inner product
+        if metric not in ("l2", "ip", "cosine"):
+            raise ValueError(f"Unsupported metric: {metric}")
+        return metric
+        
     def _create_index(self) -> faiss.Index:
         """Create FAISS index based on configuration"""
-        if self.config.vector_store_config["index_type"] == "IndexFlatL2":
-            return faiss.IndexFlatL2(self.dimension)
-        else:
-            raise ValueError(f"Unsupported index type: {self.config.vector_store_config['index_type']}")
+        vs_config = self.config.vector_store_config
+        index_type = vs_config["index_type"]
+        if index_type not in INDEX_FACTORY_STRINGS:
+            raise ValueError(f"Unsupported index type: {index_type}")
+            
+        description = INDEX_FACTORY_STRINGS[index_type].format(
+            nlist=vs_config.get("nlist", 100),
+            pq_m=vs_config.get("pq_m", 16),
+            pq_nbits=vs_config.get("pq_nbits", 8),
+            hnsw_m=vs_config.get("hnsw_m", 32)
+        )
+        faiss_metric = faiss.METRIC_L2 if self.metric == "l2" else faiss.METRIC_INNER_PRODUCT
+        index = faiss.index_factory(self.dimension, description, faiss_metric)
+        
+        if index_type == "IndexHNSWFlat":
+            index.hnsw.efConstruction = vs_config.get("ef_construction", 40)
+        self._apply_search_params(index)
+        return index
+        
+    def _apply_search_params(self, index: faiss.Index) -> None:
+        """Set query-time knobs (IVF nprobe, HNSW efSearch) from configuration"""
+        vs_config = self.config.vector_store_config
+        if hasattr(index, "nprobe"):
+            index.nprobe = vs_config.get("nprobe", 8)
+        if hasattr(index, "hnsw"):
+            index.hnsw.efSearch = vs_config.get("ef_search", 64)
+            
+    def _prepare(self, embeddings: np.ndarray) -> np.ndarray:
+        """Cast to contiguous float32 and L2-normalize for the cosine metric"""
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        if len(embeddings.shape) == 1:
+            embeddings = embeddings.reshape(1, -1)
+        if self.metric == "cosine":
+            embeddings = embeddings.copy()
+            faiss.normalize_L2(embeddings)
+        return embeddings
+        
+    def train(self, embeddings: np.ndarray) -> None:
+        """
+        Train the index (IVF centroids, PQ/SQ codebooks)
+        
+        Args:
+            embeddings: Representative sample of the vectors to be indexed
+        """
+        embeddings = self._prepare(embeddings)
+        vs_config = self.config.vector_store_config
+        required = 1
+        if hasattr(self.index, "nlist"):
+            required = max(required, self.index.nlist)
+        if vs_config["index_type"] == "IndexIVFPQ":
+            required = max(required, 2 ** vs_config.get("pq_nbits", 8))
+        if embeddings.shape[0] < required:
+            raise ValueError(
+                f"{vs_config['index_type']} needs at least {required} training vectors, got {embeddings.shape[0]}"
+            )
+            
+        self.index.train(embeddings)
             
     def add_documents(
         self,
@@ -36,8 +113,19 @@ class VectorStoreService:
         if len(documents) != embeddings.shape[0]:
             raise ValueError("Number of documents must match number of embeddings")
             
+        # A memory-mapped index is read-only, and mapped IVF inverted lists
+        # can't be serialized or cloned; re-read an owned copy from disk
+        if self.index_is_mapped:
+            self.index = faiss.read_index(self.index_path)
+            self._apply_search_params(self.index)
+            self.index_is_mapped = False
+            
+        # Quantized/IVF indexes must be trained before the first add
+        if not self.index.is_trained:
+            self.train(embeddings)
+            
         # Add to FAISS index
-        self.index.add(embeddings)
+        self.index.add(self._prepare(embeddings))
         
         # Store documents
         self.documents.extend(documents)
@@ -57,9 +145,11 @@ class VectorStoreService:
         Returns:
             List of similar documents with scores
         """
+        if self.index.ntotal == 0:
+            return []
+            
         # Reshape query embedding if needed
-        if len(query_embedding.shape) == 1:
-            query_embedding = query_embedding.reshape(1, -1)
+        query_embedding = self._prepare(query_embedding)
             
         # Search index
         distances, indices = self.index.search(query_embedding, k)
@@ -67,9 +157,12 @@ class VectorStoreService:
         # Get documents and add distances
         results = []
         for i, (distance, idx) in enumerate(zip(distances[0], indices[0])):
-            if idx < len(self.documents):  # Check if index is valid
+            if 0 <= idx < len(self.documents):  # Check if index is valid
                 doc = self.documents[idx].copy()
-                doc["score"] = float(1.0 / (1.0 + distance))  # Convert distance to similarity score
+                if self.metric == "l2":
+                    doc["score"] = float(1.0 / (1.0 + distance))  # Convert distance to similarity score
+                else:
+                    doc["score"] = float(distance)  # Inner product is already a similarity
                 results.append(doc)
                 
         return results
@@ -100,7 +193,22 @@ class VectorStoreService:
         # Load FAISS index
         index_path = os.path.join(path, "index.faiss")
         if os.path.exists(index_path):
-            self.index = faiss.read_index(index_path)
+            self.index_path = index_path
+            if self.config.vector_store_config.get("mmap", False):
+                flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+                # IO_FLAG_MMAP_IFC (faiss >= 1.10) also maps flat code storage,
+                # but IVF inverted lists refuse to load with it set
+                ifc_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", 0)
+                try:
+                    self.index = faiss.read_index(index_path, flags | ifc_flag)
+                except RuntimeError:
+                    if not ifc_flag:
+                        raise
+                    self.index = faiss.read_index(index_path, flags)
+                self.index_is_mapped = True
+            else:
+                self.index = faiss.read_index(index_path)
+            self._apply_search_params(self.index)
         
         # Load documents
         docs_path = os.path.join(path, "documents.json")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Parity tests for the ONNX embedding runtimes
+Checks that onnx / onnx-int8 embeddings stay within a cosine-similarity
+tolerance of the PyTorch model; skipped unless sentence-transformers,
+onnxruntime and optimum are installed
+"""
+import importlib.util
+import os
+import unittest
+import numpy as np
+
+from embedding_runtime import load_embedding_model
+
+MODEL_NAME = os.getenv('EMBEDDINGS_MODEL', 'all-MiniLM-L6-v2')
+
+# Minimum per-text cosine similarity to the PyTorch embedding
+THRESHOLDS = {
+    "onnx": 0.999,
+    "onnx-int8": 0.97
+}
+
+SAMPLE_TEXTS = [
+    "Activity: checkin | Mood: 3/5",
+    "Activity: checkin | Mood: 5/5 | Energy: high",
+    "Had a great workout this morning! Feeling energized and ready for the day.",
+    "I want to exercise 4 times a week and improve my overall fitness.",
+    "I've been struggling with consistency lately, need better motivation.",
+    "Feeling a bit overwhelmed with work but trying to stay positive.",
+    "Completed a 30-minute yoga session, very relaxing.",
+    "Skipped gym today, feeling guilty about it.",
+    "Reached my weekly exercise goal! Very proud of myself.",
+    "How can I build a morning routine that actually sticks?"
+]
+
+ONNX_INSTALLED = all(
+    importlib.util.find_spec(module) is not None
+    for module in ("sentence_transformers", "onnxruntime", "optimum")
+)
+
+
+def encode(runtime: str) -> np.ndarray:
+    """Normalized embeddings of SAMPLE_TEXTS on one runtime"""
+    model = load_embedding_model(MODEL_NAME, runtime)
+    return np.asarray(model.encode(SAMPLE_TEXTS, normalize_embeddings=True), dtype=np.float32)
+
+
+@unittest.skipUnless(ONNX_INSTALLED, "needs sentence-transformers, onnxruntime and optimum")
+class EmbeddingRuntimeParityTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.reference = encode("torch")
+
+    def assert_matches_torch(self, runtime: str):
+        embeddings = encode(runtime)
+        self.assertEqual(embeddings.shape, self.reference.shape)
+
+        similarities = np.sum(embeddings * self.reference, axis=1)
+        print(f"📊 {runtime}: min cosine {similarities.min():.4f}, mean {similarities.mean():.4f}")
+        self.assertGreaterEqual(
+            float(similarities.min()), THRESHOLDS[runtime],
+            f"{runtime} diverges from PyTorch on '{SAMPLE_TEXTS[int(np.argmin(similarities))]}'"
+        )
+
+    def test_onnx_matches_torch(self):
+        self.assert_matches_torch("onnx")
+
+    def test_onnx_int8_matches_torch(self):
+        self.assert_matches_torch("onnx-int8")
+
+
+if __name__ == "__main__":
+    unittest.main()
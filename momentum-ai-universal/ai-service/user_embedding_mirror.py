@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Local write-through mirror of per-user embeddings
+Keeps each user's recent behavior/conversation rows and an L2-normalized
+float32 matrix in process, so semantic search needs no Supabase round-trip
+"""
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+# Rows mirrored per kind; matches how many rows the Supabase loaders fetch
+ROW_LIMITS = {
+    "behavior": 50,
+    "conversation": 20
+}
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class UserEmbeddingMirror:
+    def __init__(self, max_users: int = 1000, ttl: float = 0.0):
+        """
+        Initialize the mirror
+
+        Args:
+            max_users: (kind, user) entries kept before the least recently used is dropped
+            ttl: Seconds before an entry is reloaded from Supabase (0 keeps it until evicted).
+                 Set this when several workers write for the same user, since each
+                 worker only sees its own writes.
+        """
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.loads = 0
+
+    def get(self, kind: str, user_id: str) -> Optional[Tuple[List[Dict[str, Any]], np.ndarray]]:
+        """Mirrored (rows, matrix) for a user, or None if it must be loaded"""
+        key = (kind, user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            rows, matrix, loaded_at = entry
+            if self.ttl and time.monotonic() - loaded_at >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows, matrix
+
+    def load(self, kind: str, user_id: str, rows: List[Dict[str, Any]], vectors: List[np.ndarray],
+             dimension: int):
+        """
+        Replace a user's entry with rows fetched from the database (newest first)
+
+        A user with no rows is mirrored too, as an empty (0, dimension) matrix,
+        so they are not re-fetched on every search; append() fills it in.
+        """
+        limit = ROW_LIMITS[kind]
+        if vectors:
+            matrix = normalize_rows(np.vstack(vectors[:limit]).astype(np.float32))
+        else:
+            matrix = np.zeros((0, dimension), dtype=np.float32)
+        with self._lock:
+            self._entries[(kind, user_id)] = (rows[:limit], matrix, time.monotonic())
+            self._entries.move_to_end((kind, user_id))
+            self.loads += 1
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+
+    def append(self, kind: str, user_id: str, row: Dict[str, Any], embedding: np.ndarray):
+        """
+        Write-through for a row just stored in the database
+
+        Users that are not mirrored yet are skipped; their first search
+        loads everything, including this row.
+        """
+        key = (kind, user_id)
+        vector = normalize_rows(np.asarray(embedding, dtype=np.float32).reshape(1, -1))
+        limit = ROW_LIMITS[kind]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            rows, matrix, loaded_at = entry
+            if matrix.shape[1] != vector.shape[1]:
+                del self._entries[key]
+                return
+            # Copy-on-write so readers holding the old (rows, matrix) are unaffected
+            self._entries[key] = ([row] + rows[:limit - 1], np.vstack([vector, matrix[:limit - 1]]), loaded_at)
+
+    def invalidate(self, kind: str, user_id: str):
+        with self._lock:
+            self._entries.pop((kind, user_id), None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "users": len(self._entries),
+            "max_users": self.max_users,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "loads": self.loads
+        }
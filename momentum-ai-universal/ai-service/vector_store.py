@@ -1,102 +1,177 @@
 from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
-from sklearn.neighbors import NearestNeighbors
-from sklearn.metrics.pairwise import cosine_similarity
 import json
 import os
 from datetime import datetime
 
+try:
+    import faiss
+except ImportError:  # faiss is optional, the flat matrix search works without it
+    faiss = None
+
+
+class GrowableMatrix:
+    """
+    Append-only contiguous float32 matrix with amortized O(1) row inserts
+    """
+    
+    def __init__(self, dimension: int, capacity: int = 1024):
+        self.dimension = dimension
+        self._data = np.zeros((max(capacity, 1), dimension), dtype=np.float32)
+        self._size = 0
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def rows(self) -> np.ndarray:
+        """View of the filled rows (no copy)"""
+        return self._data[:self._size]
+    
+    def append(self, rows: np.ndarray) -> range:
+        """
+        Append rows, doubling the backing buffer when it is full
+        """
+        rows = np.asarray(rows, dtype=np.float32).reshape(-1, self.dimension)
+        needed = self._size + len(rows)
+        
+        if needed > len(self._data):
+            capacity = len(self._data)
+            while capacity < needed:
+                capacity *= 2
+            grown = np.zeros((capacity, self.dimension), dtype=np.float32)
+            grown[:self._size] = self._data[:self._size]
+            self._data = grown
+        
+        start = self._size
+        self._data[start:needed] = rows
+        self._size = needed
+        return range(start, needed)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so inner product equals cosine similarity"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without a full sort"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
 class VectorStore:
-    def __init__(self, dimension: int = 384):
+    def __init__(self, dimension: int = 384, use_ann: bool = False,
+                 hnsw_m: int = 32, ef_search: int = 64):
         """
-        Initialize vector store with scikit-learn NearestNeighbors
+        Initialize vector store backed by a growable float32 matrix
+        
+        Args:
+            dimension: Embedding dimension
+            use_ann: Also maintain an HNSW graph (requires faiss) so global
+                searches stay sub-linear on large corpora
+            hnsw_m: HNSW graph degree
+            ef_search: HNSW search breadth (higher = better recall, slower)
         """
         self.dimension = dimension
-        self.index = NearestNeighbors(n_neighbors=10, metric='cosine')
-        self.vectors = []
+        self.vectors = GrowableMatrix(dimension)
+        self.index = None
+        if use_ann:
+            if faiss is None:
+                raise ImportError("use_ann=True requires faiss (pip install faiss-cpu)")
+            self.index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efSearch = ef_search
         self.metadata = []
         self.user_indices = {}
+        # Per-user partitions: rows of user_vectors[user_id] line up with
+        # user_indices[user_id], so user-scoped search never re-gathers rows
+        self.user_vectors: Dict[str, GrowableMatrix] = {}
+        self.deleted_ids = np.empty(0, dtype=np.int64)
         self.is_fitted = False
         
     def add_vectors(self, vectors: List[List[float]], metadata: List[Dict[str, Any]]) -> List[int]:
         """
         Add vectors to the store
         """
-        vector_ids = []
+        if not vectors:
+            return []
+        
+        normalized = _normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension))
+        vector_ids = list(self.vectors.append(normalized))
+        if self.index is not None:
+            self.index.add(normalized)
         
-        for i, (vector, meta) in enumerate(zip(vectors, metadata)):
-            vector_id = len(self.vectors)
-            self.vectors.append(vector)
+        for vector_id, meta in zip(vector_ids, metadata):
             self.metadata.append({
                 **meta,
                 'vector_id': vector_id,
                 'timestamp': datetime.now().isoformat()
             })
-            vector_ids.append(vector_id)
-            
-            # Track user-specific indices
+        
+        # Track user-specific indices and partitions
+        for row, (vector_id, meta) in enumerate(zip(vector_ids, metadata)):
             user_id = meta.get('user_id')
             if user_id:
                 if user_id not in self.user_indices:
                     self.user_indices[user_id] = []
+                    self.user_vectors[user_id] = GrowableMatrix(self.dimension, capacity=16)
                 self.user_indices[user_id].append(vector_id)
+                self.user_vectors[user_id].append(normalized[row])
         
-        # Refit the model with new vectors
-        if self.vectors:
-            self.index.fit(np.array(self.vectors))
-            self.is_fitted = True
-            
+        self.is_fitted = True
         return vector_ids
     
+    def _format_results(self, ids: np.ndarray, similarities: np.ndarray) -> List[Dict[str, Any]]:
+        results = []
+        for idx, similarity in zip(ids, similarities):
+            results.append({
+                'metadata': self.metadata[idx],
+                'distance': float(1 - similarity),
+                'similarity': float(similarity)
+            })
+        return results
+    
     def search(self, query_vector: List[float], k: int = 5, 
                user_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
-        Search for similar vectors
+        Search for similar vectors (cosine similarity)
         """
-        if not self.is_fitted or not self.vectors:
+        if not self.is_fitted or len(self.vectors) == 0:
             return []
             
-        query_vector = np.array(query_vector).reshape(1, -1)
+        query = _normalize(np.asarray(query_vector, dtype=np.float32).reshape(1, -1))[0]
         
         # Get user-specific indices if specified
         if user_id and user_id in self.user_indices:
-            user_vector_ids = self.user_indices[user_id]
-            if not user_vector_ids:
+            user_matrix = self.user_vectors[user_id]
+            if len(user_matrix) == 0:
                 return []
-                
-            # Filter vectors for this user
-            user_vectors = [self.vectors[i] for i in user_vector_ids]
-            user_metadata = [self.metadata[i] for i in user_vector_ids]
             
-            # Create temporary index for user vectors
-            if len(user_vectors) > 0:
-                user_index = NearestNeighbors(n_neighbors=min(k, len(user_vectors)), metric='cosine')
-                user_index.fit(np.array(user_vectors))
-                
-                distances, indices = user_index.kneighbors(query_vector)
-                
-                results = []
-                for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
-                    results.append({
-                        'metadata': user_metadata[idx],
-                        'distance': float(dist),
-                        'similarity': float(1 - dist)  # Convert cosine distance to similarity
-                    })
-                return results
+            scores = user_matrix.rows @ query
+            best = _top_k(scores, k)
+            user_vector_ids = np.asarray(self.user_indices[user_id], dtype=np.int64)
+            return self._format_results(user_vector_ids[best], scores[best])
+        elif self.index is not None:
+            # HNSW cannot drop rows, so over-fetch enough to skip deleted ones
+            fetch = min(k + len(self.deleted_ids), self.index.ntotal)
+            scores, ids = self.index.search(query.reshape(1, -1), fetch)
+            found = (ids[0] >= 0) & ~np.isin(ids[0], self.deleted_ids)
+            return self._format_results(ids[0][found][:k], scores[0][found][:k])
         else:
             # Search all vectors
-            distances, indices = self.index.kneighbors(query_vector)
-            
-            results = []
-            for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
-                results.append({
-                    'metadata': self.metadata[idx],
-                    'distance': float(dist),
-                    'similarity': float(1 - dist)  # Convert cosine distance to similarity
-                })
-            return results
-        
-        return []
+            scores = self.vectors.rows @ query
+            scores[self.deleted_ids] = -np.inf
+            best = _top_k(scores, k)
+            best = best[np.isfinite(scores[best])]
+            return self._format_results(best, scores[best])
     
     def get_user_vectors(self, user_id: str) -> List[Dict[str, Any]]:
         """
@@ -115,14 +190,18 @@ class VectorStore:
         if user_id not in self.user_indices:
             return 0
             
-        # Mark for deletion (in a real implementation, you'd rebuild the index)
+        # Mark for deletion; rows stay in the shared matrix but are masked out
         deleted_count = 0
         for vector_id in self.user_indices[user_id]:
             if vector_id < len(self.metadata):
                 self.metadata[vector_id]['deleted'] = True
                 deleted_count += 1
-                
+        
+        self.deleted_ids = np.union1d(
+            self.deleted_ids, np.asarray(self.user_indices[user_id], dtype=np.int64)
+        )
         del self.user_indices[user_id]
+        del self.user_vectors[user_id]
         return deleted_count
     
     def store_behavior_pattern(self, user_id: str, pattern_type: str, 
@@ -5,36 +5,133 @@ Handles embeddings, storage, and similarity search
 """
 import os
 import json
+import base64
 import pickle
+import threading
+import time
 import numpy as np
 import faiss
-from typing import List, Dict, Any, Optional, Tuple
-import requests
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple, Callable, Set
 from datetime import datetime
+from metadata_store import MetadataStore
+from ollama_embeddings import OllamaEmbeddingClient
+from embedding_retry import EmbeddingError, Backoff
+from config.ai_config import VECTOR_STORE_MMAP
+
+def read_index_mmap(path: str) -> faiss.Index:
+    """
+    Memory-map a saved index read-only instead of copying it into RAM
+    
+    IO_FLAG_MMAP_IFC (faiss >= 1.10) also maps flat code storage; older
+    releases only map IVF inverted lists.
+    """
+    flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY
+    return faiss.read_index(path, flags)
+
+def materialize_index(index: faiss.Index) -> faiss.Index:
+    """Copy a memory-mapped index into owned memory so it can be written to"""
+    return faiss.deserialize_index(faiss.serialize_index(index))
+
+class ReadWriteLock:
+    """
+    Many concurrent readers or one writer
+    
+    Waiting writers block new readers so a steady stream of searches can't
+    starve ingest. Not reentrant.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+    
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
 
 class FAISSVectorStore:
-    def __init__(self, dimension: int = 768, index_path: str = "data/vector_store"):
+    def __init__(self, dimension: int = 768, index_path: str = "data/vector_store",
+                 checkpoint_interval: int = 500, embedding_batch_size: int = 32,
+                 mmap: bool = VECTOR_STORE_MMAP,
+                 embedding_client: Optional[OllamaEmbeddingClient] = None,
+                 retry_backoff: Optional[Backoff] = None):
         """
         Initialize FAISS vector store
         
         Args:
             dimension: Embedding dimension (768 for nomic-embed-text)
             index_path: Path to store the index files
+            checkpoint_interval: Documents appended to the write-ahead log
+                before the full index and metadata are rewritten
+            embedding_batch_size: Texts per embedding request in bulk ingest
+            mmap: Memory-map the saved index read-only; it is copied into
+                RAM on the first write
+            embedding_client: Shared batched embeddings client (created if omitted)
+            retry_backoff: Retry schedule for documents whose embedding failed
         """
         self.dimension = dimension
         self.index_path = index_path
         self.index_file = os.path.join(index_path, "faiss_index.bin")
-        self.metadata_file = os.path.join(index_path, "metadata.json")
+        self.metadata_file = os.path.join(index_path, "metadata.db")
+        self.legacy_metadata_file = os.path.join(index_path, "metadata.json")
+        self.wal_file = os.path.join(index_path, "wal.jsonl")
+        self.checkpoint_interval = checkpoint_interval
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_client = embedding_client or OllamaEmbeddingClient(max_batch_size=embedding_batch_size)
+        self.mmap = mmap
+        self.index_is_mapped = False
+        self.uncheckpointed = 0
+        self.retry_backoff = retry_backoff or Backoff()
+        self._write_lock = threading.RLock()
+        # index.add may reallocate the vector storage under a running search
+        # (searches run in worker threads), so reads and writes are exclusive
+        self._index_lock = ReadWriteLock()
+        self._retry_thread: Optional[threading.Thread] = None
+        # Called with the set of user ids whose indexed data just changed
+        self.change_listeners: List[Callable[[Set[str]], None]] = []
         
         # Create directory if it doesn't exist
         os.makedirs(index_path, exist_ok=True)
         
         # Initialize FAISS index
         self.index = faiss.IndexFlatIP(dimension)  # Inner product for cosine similarity
-        self.metadata: List[Dict[str, Any]] = []
+        
+        # Metadata lives in SQLite and is hydrated per result row; its
+        # (user_id, data_type) index supplies candidate ids for filtered search
+        self.metadata = MetadataStore(self.metadata_file)
         
         # Load existing index if available
         self.load_index()
+        
+        # Resume re-embedding documents left pending by a previous run
+        if self.metadata.pending_count():
+            self._start_retry_worker()
     
     def get_embedding(self, text: str) -> np.ndarray:
         """
@@ -45,36 +142,28 @@ class FAISSVectorStore:
             
         Returns:
             numpy array of embeddings
+            
+        Raises:
+            EmbeddingError if the embedding backend fails
         """
-        try:
-            payload = {
-                "model": "nomic-embed-text",
-                "prompt": text
-            }
+        return self.embedding_client.embed(text)
+    
+    def get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """
+        Get embeddings for several texts with one request per batch
+        
+        Args:
+            texts: Texts to embed
             
-            response = requests.post(
-                'http://localhost:11434/api/embeddings',
-                json=payload,
-                timeout=30
-            )
+        Returns:
+            (len(texts), dimension) array of normalized embeddings
             
-            if response.status_code == 200:
-                result = response.json()
-                embedding = np.array(result['embedding'], dtype=np.float32)
-                
-                # Normalize for cosine similarity
-                embedding = embedding / np.linalg.norm(embedding)
-                
-                return embedding
-            else:
-                raise Exception(f"Embedding API error: {response.status_code}")
-                
-        except Exception as e:
-            print(f"Error getting embedding: {e}")
-            # Return random embedding as fallback
-            return np.random.random(self.dimension).astype(np.float32)
+        Raises:
+            EmbeddingError if the embedding backend fails
+        """
+        return self.embedding_client.embed_batch(texts)
     
-    def add_document(self, text: str, metadata: Dict[str, Any]) -> int:
+    def add_document(self, text: str, metadata: Dict[str, Any]) -> Optional[int]:
         """
         Add a document to the vector store
         
@@ -83,28 +172,132 @@ class FAISSVectorStore:
             metadata: Document metadata
             
         Returns:
-            Document ID
+            Document ID, or None if embedding failed and the document is pending
         """
-        # Get embedding
-        embedding = self.get_embedding(text)
-        
-        # Add to FAISS index
-        self.index.add(embedding.reshape(1, -1))
-        
-        # Store metadata
-        doc_id = len(self.metadata)
-        doc_metadata = {
-            "id": doc_id,
-            "text": text,
-            "timestamp": datetime.now().isoformat(),
-            **metadata
-        }
-        self.metadata.append(doc_metadata)
+        return self.add_documents([{"text": text, "metadata": metadata}])[0]
+    
+    def add_documents(self, documents: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """
+        Add documents in bulk
         
-        # Save index
-        self.save_index()
+        Embeddings are requested in batches and each batch is added to the
+        index with a single call. New rows are appended to the write-ahead
+        log; the full index is only rewritten every checkpoint_interval docs.
+        Batches whose embedding fails are parked as pending and re-embedded
+        in the background with exponential backoff.
         
-        return doc_id
+        Args:
+            documents: List of {"text": ..., "metadata": {...}} dicts
+            
+        Returns:
+            Document IDs in input order (None for documents left pending)
+            
+        Raises:
+            OSError if a batch could not be written to the WAL; earlier
+            batches stay indexed
+        """
+        doc_ids = []
+        
+        for start in range(0, len(documents), self.embedding_batch_size):
+            # Stamp now so pending documents keep their original time
+            batch = [
+                {"text": doc["text"], "metadata": {"timestamp": datetime.now().isoformat(), **doc.get("metadata", {})}}
+                for doc in documents[start:start + self.embedding_batch_size]
+            ]
+            try:
+                embeddings = self.get_embeddings([doc["text"] for doc in batch])
+            except EmbeddingError as e:
+                print(f"Error getting embeddings, deferring {len(batch)} documents: {e}")
+                self.metadata.add_pending(batch, str(e), time.time() + self.retry_backoff.delay(1))
+                self._start_retry_worker()
+                doc_ids.extend([None] * len(batch))
+                continue
+            
+            doc_ids.extend(self._index_documents(batch, embeddings))
+        
+        return doc_ids
+    
+    def _index_documents(self, batch: List[Dict[str, Any]], embeddings: np.ndarray) -> List[int]:
+        """Append embedded documents to the WAL, the index and the metadata store"""
+        with self._write_lock:
+            # Doc ids are the FAISS row numbers
+            first_id = self.index.ntotal
+            batch_ids = list(range(first_id, first_id + len(batch)))
+            
+            # Vectors hit the WAL before the index so a crash can be replayed
+            self._append_wal(first_id, embeddings)
+            with self._index_lock.write():
+                self._ensure_writable()
+                self.index.add(embeddings)
+            
+            # Store metadata
+            self.metadata.add(
+                {
+                    "id": doc_id,
+                    "text": doc["text"],
+                    **doc["metadata"]
+                }
+                for doc_id, doc in zip(batch_ids, batch)
+            )
+            
+            if self.uncheckpointed >= self.checkpoint_interval:
+                self.checkpoint()
+        
+        user_ids = {doc["metadata"]["user_id"] for doc in batch if doc["metadata"].get("user_id")}
+        for listener in self.change_listeners:
+            listener(user_ids)
+        
+        return batch_ids
+    
+    def retry_pending(self, limit: int = 32) -> int:
+        """
+        Try once to embed pending documents that are due
+        
+        Returns:
+            Number of documents that were embedded and indexed
+        """
+        due = self.metadata.due_pending(limit)
+        if not due:
+            return 0
+        
+        pending_ids = [pending_id for pending_id, _, _ in due]
+        batch = [document for _, document, _ in due]
+        try:
+            embeddings = self.get_embeddings([doc["text"] for doc in batch])
+        except EmbeddingError as e:
+            attempts = max(attempts for _, _, attempts in due) + 1
+            self.metadata.reschedule_pending(
+                pending_ids, attempts, time.time() + self.retry_backoff.delay(attempts), str(e)
+            )
+            return 0
+        
+        self._index_documents(batch, embeddings)
+        self.metadata.remove_pending(pending_ids)
+        return len(batch)
+    
+    def _start_retry_worker(self):
+        """Start the background re-embedding loop if it is not running"""
+        with self._write_lock:
+            if self._retry_thread is not None and self._retry_thread.is_alive():
+                return
+            self._retry_thread = threading.Thread(target=self._retry_loop, name="faiss-embed-retry", daemon=True)
+            self._retry_thread.start()
+    
+    def _retry_loop(self):
+        """Re-embed pending documents until none are left"""
+        while True:
+            # Decide to exit under the lock _start_retry_worker takes, so a batch
+            # deferred right now either is seen here or starts a new worker
+            with self._write_lock:
+                if not self.metadata.pending_count():
+                    self._retry_thread = None
+                    return
+            try:
+                if self.retry_pending() == 0:
+                    time.sleep(1.0)
+            except Exception as e:
+                print(f"Error retrying pending embeddings: {e}")
+                time.sleep(self.retry_backoff.base_delay)
     
     def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -121,18 +314,54 @@ class FAISSVectorStore:
             return []
         
         # Get query embedding
-        query_embedding = self.get_embedding(query)
+        try:
+            query_embedding = self.get_embedding(query)
+        except EmbeddingError as e:
+            print(f"Error embedding search query: {e}")
+            return []
+        
+        return self.search_by_vector(query_embedding, k)
+    
+    def search_by_vector(self, query_embedding: np.ndarray, k: int,
+                          candidate_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Run a k-NN query, optionally restricted to a set of doc ids
+        
+        Args:
+            query_embedding: Normalized query vector
+            k: Number of results to return
+            candidate_ids: Only these rows are scored (via a FAISS ID selector)
+            
+        Returns:
+            List of similar documents with scores
+        """
+        query_embedding = query_embedding.reshape(1, -1)
         
-        # Search
-        scores, indices = self.index.search(query_embedding.reshape(1, -1), k)
+        if candidate_ids is None:
+            with self._index_lock.read():
+                scores, indices = self.index.search(query_embedding, k)
+        else:
+            if not candidate_ids:
+                return []
+            ids = np.asarray(candidate_ids, dtype=np.int64)
+            selector = faiss.IDSelectorBatch(len(ids), faiss.swig_ptr(ids))
+            params = faiss.SearchParameters(sel=selector)
+            with self._index_lock.read():
+                scores, indices = self.index.search(query_embedding, min(k, len(ids)), params=params)
+        
+        return self._format_results(scores[0], indices[0])
+    
+    def _format_results(self, scores: np.ndarray, indices: np.ndarray) -> List[Dict[str, Any]]:
+        """Attach metadata to ranked (score, doc id) pairs, loading only those rows"""
+        rows = self.metadata.get_many(int(idx) for idx in indices if idx >= 0)
         
         results = []
-        for i, (score, idx) in enumerate(zip(scores[0], indices[0])):
-            if idx < len(self.metadata):
+        for i, (score, idx) in enumerate(zip(scores, indices)):
+            if idx in rows:
                 result = {
                     "score": float(score),
                     "rank": i + 1,
-                    **self.metadata[idx]
+                    **rows[idx]
                 }
                 results.append(result)
         
@@ -148,14 +377,37 @@ class FAISSVectorStore:
             content: Text content
             extra_metadata: Additional metadata
         """
-        metadata = {
+        return self.add_document(content, self._user_metadata(user_id, data_type, content, extra_metadata))
+    
+    def add_user_data_bulk(self, items: List[Dict[str, Any]]) -> List[Optional[int]]:
+        """
+        Add many user data entries in one batched ingest
+        
+        Args:
+            items: Dicts with user_id, data_type, content and optional extra_metadata
+            
+        Returns:
+            Document IDs in input order (None for documents left pending)
+        """
+        documents = [
+            {
+                "text": item["content"],
+                "metadata": self._user_metadata(
+                    item["user_id"], item["data_type"], item["content"], item.get("extra_metadata")
+                )
+            }
+            for item in items
+        ]
+        return self.add_documents(documents)
+    
+    def _user_metadata(self, user_id: str, data_type: str, content: str,
+                       extra_metadata: Dict[str, Any] = None) -> Dict[str, Any]:
+        return {
             "user_id": user_id,
             "data_type": data_type,
             "content": content,
             **(extra_metadata or {})
         }
-        
-        return self.add_document(content, metadata)
     
     def search_user_data(self, user_id: str, query: str, data_type: str = None, k: int = 5) -> List[Dict[str, Any]]:
         """
@@ -168,22 +420,98 @@ class FAISSVectorStore:
             k: Number of results
             
         Returns:
-            Filtered search results
+            Up to k results drawn only from the user's (data_type) partition
         """
-        results = self.search(query, k * 2)  # Get more results to filter
+        candidate_ids = self.metadata.ids_for(user_id, data_type)
+        if not candidate_ids or self.index.ntotal == 0:
+            return []
         
-        # Filter by user_id and data_type
-        filtered_results = []
-        for result in results:
-            if result.get("user_id") == user_id:
-                if data_type is None or result.get("data_type") == data_type:
-                    filtered_results.append(result)
-                    if len(filtered_results) >= k:
-                        break
+        try:
+            query_embedding = self.get_embedding(query)
+        except EmbeddingError as e:
+            print(f"Error embedding search query: {e}")
+            return []
+        return self.search_by_vector(query_embedding, k, candidate_ids)
+    
+    def search_user_data_by_vector(self, user_id: str, query_embedding: np.ndarray,
+                                   data_type: str = None, k: int = 5) -> List[Dict[str, Any]]:
+        """
+        Search user-specific data with a precomputed query embedding
         
-        return filtered_results
+        Args:
+            user_id: User identifier
+            query_embedding: Normalized query vector
+            data_type: Filter by data type
+            k: Number of results
+            
+        Returns:
+            Up to k results drawn only from the user's (data_type) partition
+        """
+        candidate_ids = self.metadata.ids_for(user_id, data_type)
+        if not candidate_ids or self.index.ntotal == 0:
+            return []
+        
+        return self.search_by_vector(query_embedding, k, candidate_ids)
+    
+    def search_user_data_grouped(self, user_id: str, query_embedding: np.ndarray,
+                                 data_types: List[str], k: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Search several of a user's data types in a single pass
+        
+        The candidate rows of all requested partitions are scored together
+        with one matrix product, then ranked per data type.
+        
+        Args:
+            user_id: User identifier
+            query_embedding: Normalized query vector
+            data_types: Data types to retrieve
+            k: Number of results per data type
+            
+        Returns:
+            Mapping of data_type -> up to k results
+        """
+        return self._rank_groups(self.metadata.ids_by_type(user_id, data_types), query_embedding, k)
+    
+    def _rank_groups(self, group_ids: Dict[str, List[int]], query_embedding: np.ndarray,
+                     k: int) -> Dict[str, List[Dict[str, Any]]]:
+        """Score the union of candidate ids once and take the top k of each group"""
+        grouped = {data_type: [] for data_type in group_ids}
+        with self._index_lock.read():
+            # Ignore metadata rows whose vectors never reached the index
+            ntotal = self.index.ntotal
+            groups = [(data_type, [i for i in ids if i < ntotal]) for data_type, ids in group_ids.items()]
+            total = sum(len(ids) for _, ids in groups)
+            if total == 0:
+                return grouped
+            
+            candidate_ids = np.concatenate([np.asarray(ids, dtype=np.int64) for _, ids in groups if ids])
+            scores = self.index.reconstruct_batch(candidate_ids) @ query_embedding.reshape(-1)
+        
+        offset = 0
+        for data_type, ids in groups:
+            group_scores = scores[offset:offset + len(ids)]
+            group_ids = candidate_ids[offset:offset + len(ids)]
+            offset += len(ids)
+            if not ids:
+                continue
+            
+            top = min(k, len(ids))
+            best = np.argpartition(-group_scores, top - 1)[:top]
+            best = best[np.argsort(-group_scores[best], kind="stable")]
+            grouped[data_type] = self._format_results(group_scores[best], group_ids[best])
+        
+        return grouped
+    
+    def get_vectors(self, doc_ids: List[int]) -> Dict[int, np.ndarray]:
+        """Stored (normalized) embeddings by doc id; ids without a vector are omitted"""
+        with self._index_lock.read():
+            ids = [int(doc_id) for doc_id in doc_ids if 0 <= int(doc_id) < self.index.ntotal]
+            if not ids:
+                return {}
+            return dict(zip(ids, self.index.reconstruct_batch(np.asarray(ids, dtype=np.int64))))
     
-    def get_user_context(self, user_id: str, query: str, context_types: List[str] = None) -> Dict[str, Any]:
+    def get_user_context(self, user_id: str, query: str, context_types: List[str] = None,
+                         query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         Get comprehensive user context for RAG
         
@@ -191,6 +519,7 @@ class FAISSVectorStore:
             user_id: User identifier
             query: Current query/context
             context_types: Types of context to retrieve
+            query_embedding: Precomputed embedding of query (embedded once if omitted)
             
         Returns:
             Structured context for RAG
@@ -201,39 +530,118 @@ class FAISSVectorStore:
         context = {
             "query": query,
             "user_id": user_id,
-            "relevant_data": {}
+            "relevant_data": {data_type: [] for data_type in context_types}
         }
         
-        for data_type in context_types:
-            results = self.search_user_data(user_id, query, data_type, k=3)
-            context["relevant_data"][data_type] = results
+        group_ids = self.metadata.ids_by_type(user_id, context_types)
+        if not any(group_ids.values()) or self.index.ntotal == 0:
+            return context
         
+        if query_embedding is None:
+            try:
+                query_embedding = self.get_embedding(query)
+            except EmbeddingError as e:
+                print(f"Error embedding context query: {e}")
+                return context
+        
+        context["relevant_data"] = self._rank_groups(group_ids, query_embedding, k=3)
         return context
     
-    def save_index(self):
-        """Save FAISS index and metadata to disk"""
+    def _append_wal(self, first_id: int, embeddings: np.ndarray):
+        """
+        Durably append new index rows (id + raw embedding) to the write-ahead log
+        
+        Raises:
+            OSError if the rows could not be persisted; the WAL is truncated back
+            to its previous length and the rows must not be indexed
+        """
+        data = "".join(
+            json.dumps({
+                "id": first_id + offset,
+                "embedding": base64.b64encode(embedding.astype(np.float32).tobytes()).decode("ascii")
+            }) + "\n"
+            for offset, embedding in enumerate(embeddings)
+        ).encode("ascii")
+        
+        # Unbuffered, so nothing is left to be flushed after a failed write
+        with open(self.wal_file, 'ab', buffering=0) as f:
+            start = f.seek(0, os.SEEK_END)
+            try:
+                if f.write(data) != len(data):
+                    raise OSError(f"Short write to WAL {self.wal_file}")
+                os.fsync(f.fileno())
+            except OSError:
+                # Don't leave a partial append for replay to pick up
+                os.ftruncate(f.fileno(), start)
+                raise
+        self.uncheckpointed += len(embeddings)
+    
+    def _replay_wal(self):
+        """Re-apply WAL rows that are newer than the last checkpoint"""
+        if not os.path.exists(self.wal_file):
+            return
+        
+        replayed = 0
+        with open(self.wal_file, 'r') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final write
+                if record["id"] != self.index.ntotal:
+                    continue  # already part of the checkpoint
+                embedding = np.frombuffer(base64.b64decode(record["embedding"]), dtype=np.float32)
+                self._ensure_writable()
+                self.index.add(embedding.reshape(1, -1))
+                replayed += 1
+        
+        self.uncheckpointed = replayed
+        if replayed:
+            print(f"✅ Replayed {replayed} documents from WAL")
+    
+    def _ensure_writable(self):
+        """Swap a memory-mapped (read-only) index for an owned copy before writing"""
+        if self.index_is_mapped:
+            self.index = materialize_index(self.index)
+            self.index_is_mapped = False
+    
+    def checkpoint(self):
+        """Write a full snapshot of the index, then truncate the WAL"""
+        if self.save_index():
+            open(self.wal_file, 'w').close()
+            self.uncheckpointed = 0
+    
+    def save_index(self) -> bool:
+        """Save FAISS index to disk (metadata is committed to SQLite on insert)"""
         try:
-            # Save FAISS index
-            faiss.write_index(self.index, self.index_file)
-            
-            # Save metadata
-            with open(self.metadata_file, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
+            # Write to a temp file first so a crash never leaves a torn snapshot
+            with self._index_lock.read():
+                faiss.write_index(self.index, self.index_file + ".tmp")
+            os.replace(self.index_file + ".tmp", self.index_file)
+            return True
                 
         except Exception as e:
             print(f"Error saving index: {e}")
+            return False
     
     def load_index(self):
         """Load FAISS index and metadata from disk"""
         try:
             if os.path.exists(self.index_file):
-                self.index = faiss.read_index(self.index_file)
-                print(f"✅ Loaded FAISS index with {self.index.ntotal} documents")
+                if self.mmap:
+                    self.index = read_index_mmap(self.index_file)
+                    self.index_is_mapped = True
+                else:
+                    self.index = faiss.read_index(self.index_file)
+                print(f"✅ Loaded FAISS index with {self.index.ntotal} documents"
+                      f"{' (mmap)' if self.index_is_mapped else ''}")
+            
+            if len(self.metadata) == 0 and os.path.exists(self.legacy_metadata_file):
+                imported = self.metadata.import_json(self.legacy_metadata_file)
+                print(f"✅ Migrated {imported} documents from metadata.json")
+            print(f"✅ Opened metadata for {len(self.metadata)} documents")
             
-            if os.path.exists(self.metadata_file):
-                with open(self.metadata_file, 'r') as f:
-                    self.metadata = json.load(f)
-                print(f"✅ Loaded metadata for {len(self.metadata)} documents")
+            self._replay_wal()
                 
         except Exception as e:
             print(f"Error loading index: {e}")
@@ -244,7 +652,10 @@ class FAISSVectorStore:
             "total_documents": self.index.ntotal,
             "dimension": self.dimension,
             "index_type": "IndexFlatIP",
+            "mmap": self.index_is_mapped,
             "metadata_count": len(self.metadata),
+            "wal_pending_documents": self.uncheckpointed,
+            "pending_embeddings": self.metadata.pending_count(),
             "index_file_exists": os.path.exists(self.index_file),
             "metadata_file_exists": os.path.exists(self.metadata_file)
         }